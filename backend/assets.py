@@ -0,0 +1,196 @@
+"""Fingerprinted, precompressed frontend assets.
+
+`flask build-assets` copies every file under static/ to ASSETS_BUILD_PATH as
+<name>.<content hash>.<ext>. It then rewrites the src/href references in the
+top-level HTML pages to those names, and writes a gzip variant of every file
+(plus brotli when the `brotli` package is installed). A manifest.json maps each
+source path to its built name.
+
+The /assets/<name> route serves the best precompressed variant for the
+request's Accept-Encoding. Names change whenever the content does, so those
+responses are cached for a year as immutable. Pages keep their names and are
+served from /<page>.html with `no-cache` and a content-hash ETag. A repeat visit
+therefore costs one 304 per page and nothing for its scripts.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import tempfile
+import threading
+
+from flask import Blueprint, abort, current_app, request, send_file
+
+# brotli is optional; without it only gzip variants are built
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SITE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ASSET_SOURCE_DIR = 'static'
+ASSET_URL_PREFIX = '/assets/'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+# Below this size compression saves less than the extra header costs
+MIN_COMPRESS_BYTES = 256
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+# Encodings in order of preference, with the suffix of their precompressed files
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+REFERENCE_PATTERN = re.compile(r'''(\b(?:src|href)=)(["'])([^"']+)\2''')
+
+assets_bp = Blueprint('assets_bp', __name__)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_variants(path, data):
+    """Writes a file plus its compressed variants; returns the built file names."""
+    write_atomic(path, data)
+    written = [path]
+    if len(data) < MIN_COMPRESS_BYTES:
+        return written
+    # mtime=0 keeps the gzip bytes identical between builds of the same content
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            write_atomic(path + suffix, compressed)
+            written.append(path + suffix)
+    return written
+
+
+def rewrite_references(html, assets):
+    """Points src/href attributes that name a source asset at its fingerprinted URL."""
+    def replace(match):
+        prefix, quote, url = match.groups()
+        built = assets.get(url.lstrip('./').lstrip('/'))
+        if built is None:
+            return match.group(0)
+        return f'{prefix}{quote}{ASSET_URL_PREFIX}{built}{quote}'
+    return REFERENCE_PATTERN.sub(replace, html)
+
+
+def build_assets(output_dir, source_root=SITE_ROOT, clean=False):
+    """Builds every asset and page into output_dir and returns the new manifest."""
+    assets = {}
+    built_files = set()
+    source_dir = os.path.join(source_root, ASSET_SOURCE_DIR)
+    for directory, _, files in os.walk(source_dir):
+        for file_name in sorted(files):
+            source_path = os.path.join(directory, file_name)
+            with open(source_path, 'rb') as f:
+                data = f.read()
+            relative = os.path.relpath(source_path, source_root).replace(os.sep, '/')
+            stem, extension = os.path.splitext(os.path.relpath(source_path, source_dir).replace(os.sep, '/'))
+            built_name = f'{stem}.{content_hash(data)}{extension}'
+            assets[relative] = built_name
+            built_files.update(write_variants(os.path.join(output_dir, 'static', built_name), data))
+
+    pages = {}
+    for file_name in sorted(os.listdir(source_root)):
+        if not file_name.endswith('.html'):
+            continue
+        with open(os.path.join(source_root, file_name), encoding='utf-8') as f:
+            data = rewrite_references(f.read(), assets).encode('utf-8')
+        pages[file_name] = content_hash(data)
+        built_files.update(write_variants(os.path.join(output_dir, 'pages', file_name), data))
+
+    manifest = {'assets': assets, 'pages': pages}
+    write_atomic(os.path.join(output_dir, MANIFEST_NAME), json.dumps(manifest, indent=2, sort_keys=True).encode())
+
+    if clean:
+        # Older fingerprints stay by default so pages cached before the build keep working
+        for directory in ('static', 'pages'):
+            for parent, _, files in os.walk(os.path.join(output_dir, directory)):
+                for file_name in files:
+                    path = os.path.join(parent, file_name)
+                    if path not in built_files:
+                        os.remove(path)
+    return manifest
+
+
+class AssetManifest:
+    """The current build's manifest, re-read when a rebuild replaces it."""
+
+    def __init__(self, build_dir):
+        self.build_dir = build_dir
+        self.path = os.path.join(build_dir, MANIFEST_NAME)
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.data = None
+
+    def current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            if mtime != self.mtime:
+                with open(self.path, encoding='utf-8') as f:
+                    self.data = json.load(f)
+                self.mtime = mtime
+            return self.data
+
+
+def send_precompressed(path, etag, cache_control):
+    """Sends the best variant of path that the client accepts, or the plain file."""
+    # The type of the original file, not of its .gz/.br variant
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    encoding = None
+    for name, suffix in ENCODINGS:
+        if request.accept_encodings[name] and os.path.exists(path + suffix):
+            encoding, path = name, path + suffix
+            break
+    response = send_file(path, mimetype=mimetype, conditional=True,
+                         etag=f'{etag}-{encoding}' if encoding else etag)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+@assets_bp.route(ASSET_URL_PREFIX + '<path:name>', methods=['GET'])
+def get_asset(name):
+    asset_manifest = current_app.extensions['asset_manifest']
+    manifest = asset_manifest.current()
+    path = os.path.join(asset_manifest.build_dir, 'static', name) if manifest else None
+    if path is None or '..' in name.split('/') or not os.path.isfile(path):
+        abort(404)
+    # The name carries the content hash, so it doubles as the ETag
+    return send_precompressed(path, name, f'public, max-age={ASSET_MAX_AGE}, immutable')
+
+
+@assets_bp.route('/<page>.html', methods=['GET'])
+def get_page(page):
+    asset_manifest = current_app.extensions['asset_manifest']
+    manifest = asset_manifest.current()
+    file_name = f'{page}.html'
+    if not manifest or file_name not in manifest['pages']:
+        abort(404)
+    return send_precompressed(os.path.join(asset_manifest.build_dir, 'pages', file_name),
+                              manifest['pages'][file_name], 'no-cache')
+
+
+def init_assets(app):
+    """Reads the build location and registers the asset and page routes."""
+    app.config.setdefault('ASSETS_BUILD_PATH', os.environ.get(
+        'ASSETS_BUILD_PATH', os.path.join(app.instance_path, 'assets')))
+    app.extensions['asset_manifest'] = AssetManifest(app.config['ASSETS_BUILD_PATH'])
+    app.register_blueprint(assets_bp)
@@ -0,0 +1,75 @@
+"""Per-request user resolution.
+
+The user comes from an `Authorization: Bearer <token>` header (tokens are created
+with `flask create-token`). Token lookups are cached in process for
+AUTH_TOKEN_CACHE_TTL seconds, so most requests skip the api_token query (a deleted
+token therefore keeps working in other workers for at most that long). Requests
+without a token fall back to DEFAULT_USER_ID unless AUTH_REQUIRED is set, which
+keeps the single-user frontend working.
+
+The session cookie is not an identity: nothing logs a user in, and trusting
+session['user_id'] would only let whoever knows SECRET_KEY pick any user.
+"""
+import hashlib
+import os
+import secrets
+
+from flask import current_app, g, jsonify, request
+
+from backend.extensions import db
+from backend.cache import MemoryCache
+from backend.models import ApiToken
+
+# User served when a request carries no token and AUTH_REQUIRED is off
+DEFAULT_USER_ID = 1
+
+
+def hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def create_token(user_id):
+    """Creates and stores a new token for the user; returns the raw token (shown once)."""
+    token = secrets.token_urlsafe(32)
+    db.session.add(ApiToken(token_hash=hash_token(token), user_id=user_id))
+    db.session.commit()
+    return token
+
+
+def user_id_for_token(token):
+    """Returns the token's user id, or None for an unknown token."""
+    token_hash = hash_token(token)
+    token_cache = current_app.extensions['token_cache']
+    user_id = token_cache.get(token_hash)
+    if user_id is None:
+        user_id = db.session.query(ApiToken.user_id).filter_by(token_hash=token_hash).scalar()
+        if user_id is not None:
+            token_cache.set(token_hash, user_id)
+    return user_id
+
+
+def load_current_user():
+    """before_request hook: resolves the caller into g.user_id or answers 401."""
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        user_id = user_id_for_token(authorization[len('Bearer '):].strip())
+        if user_id is None:
+            return jsonify({'message': 'Invalid API token'}), 401
+    elif current_app.config['AUTH_REQUIRED']:
+        return jsonify({'message': 'Authentication required'}), 401
+    else:
+        user_id = DEFAULT_USER_ID
+    g.user_id = user_id
+
+
+def current_user_id():
+    return g.user_id
+
+
+def init_auth(app):
+    """Reads the auth settings and creates this app's token cache."""
+    app.config.setdefault('AUTH_REQUIRED', os.environ.get('AUTH_REQUIRED') == '1')
+    app.config.setdefault('AUTH_TOKEN_CACHE_TTL', int(os.environ.get('AUTH_TOKEN_CACHE_TTL', 300)))
+    app.config.setdefault('AUTH_TOKEN_CACHE_SIZE', int(os.environ.get('AUTH_TOKEN_CACHE_SIZE', 100000)))
+    app.extensions['token_cache'] = MemoryCache(app.config['AUTH_TOKEN_CACHE_SIZE'],
+                                                app.config['AUTH_TOKEN_CACHE_TTL'])
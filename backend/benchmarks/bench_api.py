@@ -0,0 +1,321 @@
+"""End-to-end API benchmark: latency percentiles, throughput and SQL queries per scenario.
+
+Loads a synthetic library (see synthetic.py) into a throwaway database and runs
+each scenario (list, detail, update, stats, search, similar books...) as random
+token-authenticated users. Requests go to one of three targets:
+- the Flask test client (--target client, the default),
+- Werkzeug's threaded WSGI server started in-process on a free port (--target server),
+- a server you started yourself, e.g. gunicorn, loaded with synthetic.py using the
+  same scale and seed (--url http://127.0.0.1:8000).
+Query counts are read from the Server-Timing header, so the in-process targets run
+with PERF_INSTRUMENTATION=1, and an external server needs it switched on too.
+
+--save-baseline FILE stores the results as JSON. --baseline FILE compares against
+a saved run, flags every scenario whose p95 latency grew by more than --threshold
+or whose query count went up, and exits with status 1 if anything regressed.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_api --save-baseline /tmp/api-baseline.json
+    python -m backend.benchmarks.bench_api --baseline /tmp/api-baseline.json
+    python -m backend.benchmarks.bench_api --target server --concurrency 8 --scenarios list_page,detail
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+# Point the app at a throwaway database before it is imported
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(_tmpdir.name, 'bench.db'))
+os.environ.setdefault('PERF_INSTRUMENTATION', '1')
+os.environ.setdefault('COVER_FETCH_ENABLED', '0')
+os.environ.setdefault('JOBS_DB_PATH', os.path.join(_tmpdir.name, 'jobs.db'))
+os.environ.setdefault('STATS_CACHE_PATH', os.path.join(_tmpdir.name, 'stats_cache.db'))
+os.environ.setdefault('RECS_INDEX_PATH', os.path.join(_tmpdir.name, 'recs.bin'))
+
+from backend.benchmarks.synthetic import STATUSES, WORDS, generate_library, populate  # noqa: E402
+
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def scenario_list_page(rng, user_id, books):
+    return 'GET', '/api/books/?limit=50', None
+
+
+def scenario_list_sparse(rng, user_id, books):
+    return 'GET', '/api/books/?limit=50&status=read&fields=title,author,cover_image_url', None
+
+
+def scenario_list_full(rng, user_id, books):
+    return 'GET', '/api/books/', None
+
+
+def scenario_detail(rng, user_id, books):
+    return 'GET', f'/api/books/{rng.choice(books)}', None
+
+
+def scenario_update(rng, user_id, books):
+    return 'PUT', f'/api/books/{rng.choice(books)}', {
+        'status': rng.choice(STATUSES), 'current_page': rng.randint(0, 300), 'rating': rng.randint(1, 5)}
+
+
+def scenario_progress_batch(rng, user_id, books):
+    return 'PATCH', '/api/books/progress', [
+        {'book_id': book_id, 'current_page': rng.randint(0, 300)} for book_id in rng.sample(books, min(10, len(books)))]
+
+
+def scenario_stats_overview(rng, user_id, books):
+    return 'GET', '/api/stats/overview', None
+
+
+def scenario_stats_summary(rng, user_id, books):
+    return 'GET', '/api/stats/summary', None
+
+
+def scenario_search(rng, user_id, books):
+    return 'GET', f'/api/books/search?q={rng.choice(WORDS)}&limit=20', None
+
+
+def scenario_similar(rng, user_id, books):
+    return 'GET', f'/api/books/{rng.choice(books)}/similar', None
+
+
+def scenario_recommendations(rng, user_id, books):
+    return 'GET', '/api/recommendations?limit=10', None
+
+
+SCENARIOS = {
+    'list_page': scenario_list_page,
+    'list_sparse': scenario_list_sparse,
+    'list_full': scenario_list_full,
+    'detail': scenario_detail,
+    'update': scenario_update,
+    'progress_batch': scenario_progress_batch,
+    'stats_overview': scenario_stats_overview,
+    'stats_summary': scenario_stats_summary,
+    'search': scenario_search,
+    'similar': scenario_similar,
+    'recommendations': scenario_recommendations,
+}
+
+
+class ClientTarget:
+    """Calls the app in-process through the Flask test client (one client per thread)."""
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body, token):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body, headers={'Authorization': f'Bearer {token}'})
+        response.get_data()
+        return response.status_code, response.headers.get('Server-Timing', '')
+
+
+class HTTPTarget:
+    """Calls a real HTTP server over keep-alive connections (one per thread)."""
+
+    def __init__(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.local = threading.local()
+
+    def request(self, method, path, body, token):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        headers = {'Authorization': f'Bearer {token}'}
+        data = None
+        if body is not None:
+            data = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+        connection.request(method, path, body=data, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status, response.getheader('Server-Timing', '')
+
+
+def start_server(app):
+    """Serves the app with Werkzeug's threaded WSGI server on a free port; returns its URL."""
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_scenario(target, scenario, library, requests, concurrency, warmup, seed):
+    """Runs one scenario and returns its summary dict."""
+    users = sorted(library)
+    timings, queries, errors = [], [], []
+    lock = threading.Lock()
+
+    def worker(worker_id, count, record):
+        rng = random.Random(seed * 1000 + worker_id)
+        for _ in range(count):
+            user_id = rng.choice(users)
+            method, path, body = scenario(rng, user_id, library[user_id])
+            started = time.perf_counter()
+            status, server_timing = target.request(method, path, body, f'token-{user_id}')
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if not record:
+                continue
+            match = SERVER_TIMING_QUERIES.search(server_timing)
+            with lock:
+                if status >= 400:
+                    errors.append(status)
+                timings.append(elapsed_ms)
+                if match:
+                    queries.append(int(match.group(1)))
+
+    worker(-1, warmup, record=False)
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(i, n, True)) for i, n in enumerate(per_worker)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': len(timings),
+        'errors': len(errors),
+        'throughput_rps': round(len(timings) / elapsed, 1),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'queries': round(statistics.fmean(queries), 2) if queries else None,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Prints the change against a baseline run; returns the names of regressed scenarios."""
+    regressed = []
+    print(f"\nAgainst baseline (p95 threshold +{threshold:.0%}):")
+    for key in ('target', 'users', 'books', 'statuses_per_user', 'concurrency'):
+        if results['meta'][key] != baseline['meta'].get(key):
+            print(f"  warning: {key} differs ({baseline['meta'].get(key)} -> {results['meta'][key]}), "
+                  f"so the numbers are not comparable")
+    for name, current in results['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            print(f"  {name:<16} new scenario")
+            continue
+        change = current['p95_ms'] / previous['p95_ms'] - 1 if previous['p95_ms'] else 0.0
+        problems = []
+        if change > threshold:
+            problems.append(f"p95 {previous['p95_ms']:.2f} -> {current['p95_ms']:.2f} ms")
+        if current['queries'] is not None and previous['queries'] is not None \
+                and current['queries'] > previous['queries'] + 0.5:
+            problems.append(f"queries {previous['queries']} -> {current['queries']}")
+        if current['errors'] > previous['errors']:
+            problems.append(f"errors {previous['errors']} -> {current['errors']}")
+        if problems:
+            regressed.append(name)
+            print(f"  {name:<16} REGRESSION: {'; '.join(problems)}")
+        else:
+            print(f"  {name:<16} ok (p95 {change:+.0%})")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', choices=('client', 'server'), default='client')
+    parser.add_argument('--url', help='Benchmark an already running server instead (implies no data loading).')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--statuses-per-user', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--requests', type=int, default=300, help='Measured requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=20, help='Unmeasured requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=1, help='Client threads per scenario.')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument('--save-baseline', metavar='FILE', help='Write the results to FILE as JSON.')
+    parser.add_argument('--baseline', metavar='FILE', help='Compare with results saved by --save-baseline.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p95 growth (0.2 = 20%%).')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    library = defaultdict(list)
+    for user_id, book_id, *_ in generate_library(args.users, args.books, args.statuses_per_user, args.seed):
+        library[user_id].append(book_id)
+
+    if args.url:
+        target = HTTPTarget(args.url)
+        target_name = args.url
+    else:
+        from backend.app import app, db
+        from backend.recommendations import build_index
+        with app.app_context():
+            started = time.perf_counter()
+            count = populate(db, args.users, args.books, args.statuses_per_user, args.seed)
+            build_index(app.config['RECS_INDEX_PATH'], app.config['RECS_TOP_K'])
+            print(f"Loaded {args.users:,} users / {count:,} reading statuses and built the "
+                  f"similar-books index in {time.perf_counter() - started:.1f}s")
+        if args.target == 'server':
+            target = HTTPTarget(start_server(app))
+            target_name = 'werkzeug threaded server'
+        else:
+            target = ClientTarget(app)
+            target_name = 'flask test client'
+
+    results = {
+        'meta': {
+            'target': target_name, 'users': args.users, 'books': args.books,
+            'statuses_per_user': args.statuses_per_user, 'requests': args.requests,
+            'concurrency': args.concurrency, 'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'scenarios': {},
+    }
+    print(f"Target: {target_name}, {args.requests} requests per scenario, concurrency {args.concurrency}")
+    print(f"  {'scenario':<16} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}")
+    for name in names:
+        summary = run_scenario(target, SCENARIOS[name], library, args.requests, args.concurrency,
+                               args.warmup, args.seed)
+        results['scenarios'][name] = summary
+        queries = '-' if summary['queries'] is None else f"{summary['queries']:g}"
+        print(f"  {name:<16} {summary['throughput_rps']:>8,.0f} {summary['p50_ms']:>8.2f} "
+              f"{summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f} {queries:>8} {summary['errors']:>7}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Concurrent read/write load benchmark: default SQLite settings vs the tuned pragmas.
+
+Starts several reader and writer processes (like gunicorn workers) against one
+SQLite file and reports throughput and "database is locked" errors for each
+configuration.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_concurrency --readers 4 --writers 2 --seconds 5
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from backend.extensions import db
+import backend.models  # noqa: F401  (registers the tables on db.metadata)
+from backend.db_config import DEFAULT_SQLITE_PRAGMAS, apply_sqlite_pragmas
+
+ROWS = 20000
+
+READ_SQL = text(
+    "SELECT count(id), sum(current_page) FROM reading_status WHERE user_id = :user_id AND status = 'read'"
+)
+WRITE_SQL = text("UPDATE reading_status SET current_page = current_page + 1 WHERE id = :id")
+
+
+def make_engine(path, tuned):
+    # timeout=1 keeps the untuned run from hiding lock contention behind long waits
+    engine = create_engine('sqlite:///' + path, connect_args={} if tuned else {'timeout': 1})
+    if tuned:
+        apply_sqlite_pragmas(engine, DEFAULT_SQLITE_PRAGMAS)
+    return engine
+
+
+def setup_database(path):
+    engine = create_engine('sqlite:///' + path)
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO user (id, username, email, password_hash) VALUES (?, ?, ?, ?)",
+            [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, 11)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO book (id, title, author) VALUES (?, ?, ?)",
+            [(b, f'Book {b}', 'Author') for b in range(1, ROWS // 10 + 1)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO reading_status (user_id, book_id, status, current_page, added_date) "
+            "VALUES (?, ?, 'read', 0, '2024-01-01')",
+            [(u, b) for u in range(1, 11) for b in range(1, ROWS // 10 + 1)],
+        )
+    engine.dispose()
+
+
+def worker(args):
+    path, tuned, role, seconds = args
+    engine = make_engine(path, tuned)
+    rng = random.Random(os.getpid())
+    ops = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with engine.begin() as connection:
+                if role == 'reader':
+                    connection.execute(READ_SQL, {'user_id': rng.randint(1, 10)}).fetchall()
+                else:
+                    connection.execute(WRITE_SQL, {'id': rng.randint(1, ROWS)})
+            ops += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            errors += 1
+    engine.dispose()
+    return role, ops, errors
+
+
+def run(path, tuned, readers, writers, seconds):
+    jobs = [(path, tuned, 'reader', seconds)] * readers + [(path, tuned, 'writer', seconds)] * writers
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.map(worker, jobs)
+    totals = {}
+    for role, ops, errors in results:
+        done, failed = totals.get(role, (0, 0))
+        totals[role] = (done + ops, failed + errors)
+    label = 'tuned (WAL + pragmas)' if tuned else 'default'
+    print(f"{label}:")
+    for role, (ops, errors) in sorted(totals.items()):
+        print(f"  {role}s: {ops / seconds:,.0f} ops/s, {errors} 'database is locked' errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    for tuned in (False, True):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            setup_database(path)
+            run(path, tuned, args.readers, args.writers, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Multi-tenant load test: per-user request throughput as the database grows.
+
+Fills a throwaway database with `users` users, each holding `statuses-per-user`
+reading statuses drawn from a shared catalogue (the defaults, 10k users x 1000
+statuses, give 10M reading_status rows). It then issues token-authenticated
+requests for random users through the Flask test client and reports throughput
+and latency percentiles. Run it at several --users values to see that per-request
+cost stays flat on the indexed schema, because every query is bounded by one user.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_multi_tenant --users 10000 --statuses-per-user 1000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+# Point the app at a throwaway database before it is imported
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir.name, 'bench.db')
+os.environ['STATS_CACHE_BACKEND'] = 'none'
+
+from backend.app import app, db  # noqa: E402
+from backend.auth import hash_token  # noqa: E402
+from backend.stats_rollup import rebuild_rollup  # noqa: E402
+
+STATUSES = ('want_to_read', 'currently_reading', 'read')
+INSERT_CHUNK = 100000
+
+ENDPOINTS = (
+    '/api/books/?limit=50&status=read&fields=title,author,cover_image_url',
+    '/api/books/?limit=50&status=currently_reading',
+    '/api/stats/overview',
+    '/api/profile/',
+)
+
+
+def populate(users, statuses_per_user, catalogue):
+    rng = random.Random(7)
+    db.create_all()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO user (id, username, email, password_hash) VALUES (?, ?, ?, ?)",
+            [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, users + 1)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO api_token (token_hash, user_id, created_date) VALUES (?, ?, '2024-01-01')",
+            [(hash_token(f'token-{u}'), u) for u in range(1, users + 1)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO book (id, title, author, page_count) VALUES (?, ?, ?, ?)",
+            [(b, f'Book {b}', f'Author {b % 5000}', rng.randint(80, 900)) for b in range(1, catalogue + 1)],
+        )
+    rows = []
+    for u in range(1, users + 1):
+        for b in rng.sample(range(1, catalogue + 1), statuses_per_user):
+            status = rng.choice(STATUSES)
+            finish = f'20{rng.randint(20, 25)}-{rng.randint(1, 12):02d}-15' if status == 'read' else None
+            rows.append((u, b, status, finish))
+            if len(rows) >= INSERT_CHUNK:
+                insert_statuses(rows)
+                rows = []
+    if rows:
+        insert_statuses(rows)
+    rebuild_rollup()
+
+
+def insert_statuses(rows):
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO reading_status (user_id, book_id, status, finish_date, added_date) "
+            "VALUES (?, ?, ?, ?, '2024-01-01')",
+            rows,
+        )
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--statuses-per-user', type=int, default=1000)
+    parser.add_argument('--catalogue', type=int, default=200000, help='Number of distinct books.')
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        started = time.perf_counter()
+        populate(args.users, args.statuses_per_user, max(args.catalogue, args.statuses_per_user))
+        print(f"Loaded {args.users:,} users / {args.users * args.statuses_per_user:,} reading statuses "
+              f"in {time.perf_counter() - started:.0f}s")
+
+    client = app.test_client()
+    rng = random.Random(11)
+    timings = {endpoint: [] for endpoint in ENDPOINTS}
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        endpoint = rng.choice(ENDPOINTS)
+        user_id = rng.randint(1, args.users)
+        request_started = time.perf_counter()
+        response = client.get(endpoint, headers={'Authorization': f'Bearer token-{user_id}'})
+        timings[endpoint].append((time.perf_counter() - request_started) * 1000)
+        assert response.status_code == 200, (endpoint, response.status_code)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.requests / elapsed:,.0f} requests/s overall")
+    for endpoint, values in timings.items():
+        if values:
+            print(f"  {endpoint}: p50 {statistics.median(values):.2f} ms, "
+                  f"p95 {percentile(values, 0.95):.2f} ms, p99 {percentile(values, 0.99):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Before/after query-plan benchmark for the reading_status indexes.
+
+Builds a throwaway SQLite database from the models, fills it with synthetic
+reading statuses, then runs the hot stats/list queries without and with the
+composite indexes, printing the query plan and timing for each.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_query_plans --users 200 --books-per-user 500
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine
+
+from backend.extensions import db
+from backend.models import ReadingStatus
+
+STATUSES = ('want_to_read', 'currently_reading', 'read')
+
+QUERIES = {
+    'summary_count': (
+        "SELECT count(id) FROM reading_status WHERE user_id = ? AND status = 'read'"
+    ),
+    'books_per_month': (
+        "SELECT strftime('%Y', finish_date) AS year, strftime('%m', finish_date) AS month, count(id) "
+        "FROM reading_status WHERE user_id = ? AND status = 'read' AND finish_date IS NOT NULL "
+        "GROUP BY year, month"
+    ),
+    'pages_per_month': (
+        "SELECT strftime('%Y', rs.finish_date) AS year, strftime('%m', rs.finish_date) AS month, sum(b.page_count) "
+        "FROM reading_status rs JOIN book b ON rs.book_id = b.id "
+        "WHERE rs.user_id = ? AND rs.status = 'read' AND rs.finish_date IS NOT NULL "
+        "GROUP BY year, month"
+    ),
+    'list_by_status_page': (
+        "SELECT id FROM reading_status WHERE user_id = ? AND status = 'currently_reading' "
+        "AND id > 0 ORDER BY id LIMIT 50"
+    ),
+}
+
+
+def populate(engine, users, books_per_user):
+    rng = random.Random(42)
+    start = date.today() - timedelta(days=3 * 365)
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO user (id, username, email, password_hash) VALUES (?, ?, ?, ?)",
+            [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, users + 1)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO book (id, title, author, page_count) VALUES (?, ?, ?, ?)",
+            [(b, f'Book {b}', f'Author {b % 500}', rng.randint(80, 900)) for b in range(1, books_per_user + 1)],
+        )
+        rows = []
+        for u in range(1, users + 1):
+            for b in range(1, books_per_user + 1):
+                status = rng.choice(STATUSES)
+                finish = (start + timedelta(days=rng.randint(0, 3 * 365))).isoformat() if status == 'read' else None
+                rating = rng.randint(1, 5) if status == 'read' else None
+                rows.append((u, b, status, rating, finish, start.isoformat()))
+        connection.exec_driver_sql(
+            "INSERT INTO reading_status (user_id, book_id, status, rating, finish_date, added_date) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def run_queries(engine, users, repeats):
+    user_id = users // 2 or 1
+    with engine.connect() as connection:
+        for name, sql in QUERIES.items():
+            plan = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql, (user_id,)).fetchall()
+            timings = []
+            for _ in range(repeats):
+                started = time.perf_counter()
+                connection.exec_driver_sql(sql, (user_id,)).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"  {name}: median {statistics.median(timings):.3f} ms")
+            for row in plan:
+                print(f"      plan: {row[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--books-per-user', type=int, default=500)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine('sqlite:///' + os.path.join(tmp, 'bench.db'))
+        db.metadata.create_all(engine)
+        indexes = list(ReadingStatus.__table__.indexes)
+        for index in indexes:
+            index.drop(bind=engine)
+
+        populate(engine, args.users, args.books_per_user)
+        print(f"{args.users * args.books_per_user} reading_status rows")
+
+        print("Before (unique constraint only):")
+        run_queries(engine, args.users, args.repeats)
+
+        for index in indexes:
+            index.create(bind=engine)
+        with engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+
+        print("After (composite indexes):")
+        run_queries(engine, args.users, args.repeats)
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
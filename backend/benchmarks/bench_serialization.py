@@ -0,0 +1,100 @@
+"""Microbenchmark: ORM hydration + serialize_book_with_status vs the columns-only list path.
+
+Compares, at several library sizes:
+- orm:          query(Book, ReadingStatus) -> serialize_book_with_status -> stdlib json
+- columns:      row tuples with every field -> FastJSONProvider (orjson if installed)
+- columns+sparse: row tuples with the dashboard's list fields only
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_serialization --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+# Point the app at a throwaway database before it is imported
+_tmpdir = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmpdir.name, 'bench.db')
+os.environ.setdefault('STATS_CACHE_BACKEND', 'none')
+
+from backend.app import app, db  # noqa: E402
+from backend.models import Book, ReadingStatus  # noqa: E402
+from backend.routes.book_routes import (  # noqa: E402
+    build_row_serializer, parse_fields, serialize_book_with_status,
+)
+
+LIST_FIELDS = 'title,author,cover_image_url,reading_status.finish_date,reading_status.added_date'
+DESCRIPTION = 'A long description of the book. ' * 32
+NOTES = 'Some reading notes. ' * 10
+
+
+def populate(size):
+    db.drop_all()
+    db.create_all()
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO user (id, username, email, password_hash) VALUES (1, 'bench', 'bench@example.com', 'x')"
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO book (id, title, author, page_count, description, genre) VALUES (?, ?, ?, ?, ?, ?)",
+            [(i, f'Book {i}', f'Author {i % 300}', 300, DESCRIPTION, 'Fiction') for i in range(1, size + 1)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO reading_status (user_id, book_id, status, current_page, rating, start_date, "
+            "finish_date, added_date, notes) VALUES (1, ?, 'read', 300, 4, '2024-01-01', '2024-02-01', "
+            "'2023-12-01', ?)",
+            [(i, NOTES) for i in range(1, size + 1)],
+        )
+
+
+def base_query(*entities):
+    return db.session.query(*entities).join(
+        ReadingStatus, Book.id == ReadingStatus.book_id
+    ).filter(ReadingStatus.user_id == 1).order_by(ReadingStatus.id)
+
+
+def orm_path():
+    rows = base_query(Book, ReadingStatus).all()
+    body = json.dumps([serialize_book_with_status(b, rs) for b, rs in rows],
+                      sort_keys=True, separators=(',', ':'))
+    db.session.expunge_all()
+    return body
+
+
+def columns_path(fields=None):
+    columns, serialize = build_row_serializer(*parse_fields(fields))
+    return app.json.dumps([serialize(row) for row in base_query(*columns).all()], separators=(',', ':'))
+
+
+def timed(fn, repeats):
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    with app.app_context():
+        for size in args.sizes:
+            populate(size)
+            assert json.loads(orm_path()) == json.loads(columns_path()), 'columns path output differs'
+            print(f"{size:,} rows:")
+            for name, fn in (('orm', orm_path),
+                             ('columns', columns_path),
+                             ('columns+sparse', lambda: columns_path(LIST_FIELDS))):
+                ms, nbytes = timed(fn, args.repeats)
+                print(f"  {name:<15} {ms:9.1f} ms  {nbytes / 1024:9.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
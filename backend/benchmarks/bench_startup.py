@@ -0,0 +1,200 @@
+"""Cold-start benchmark: import time, create_app() and time to first request.
+
+Every run is a fresh interpreter started with `python -X importtime`, the way a
+CLI command or a gunicorn worker without --preload starts. The interpreter
+imports backend.app, builds an app with create_app() against a throwaway
+database, and then serves the first request to / and to /api/books/ through the
+test client. The benchmark reports the median of --runs runs for each phase, how
+many modules each phase loaded, and the modules with the most import time of
+their own.
+
+It also checks that importing backend.app leaves the models and blueprints
+unloaded. Building an app must not pull in the modules that only background work
+needs (LAZY_AFTER_CREATE). backend/tests/test_startup.py runs the same check on
+every test run; the timings are only compared here.
+
+--save-baseline FILE stores the results as JSON. --baseline FILE compares against
+a saved run, flags every phase that got slower by more than --threshold and every
+module that is no longer lazy, and exits with status 1 if anything regressed.
+
+Usage (from the repository root):
+    python -m backend.benchmarks.bench_startup --save-baseline /tmp/startup-baseline.json
+    python -m backend.benchmarks.bench_startup --baseline /tmp/startup-baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must not be imported by `import backend.app` alone
+LAZY_AFTER_IMPORT = ('backend.models', 'backend.routes.book_routes', 'backend.jobs')
+# Must not be imported by create_app(); only cover thumbnails and the worker pool need them
+LAZY_AFTER_CREATE = ('PIL', 'PIL.Image', 'concurrent.futures.process')
+
+PHASES = ('import_ms', 'create_app_ms', 'first_request_ms', 'first_api_request_ms', 'total_ms')
+
+# Runs in the child interpreter; prints one JSON line with its timings
+CHILD_SCRIPT = r'''
+import json, sys, time
+started = time.perf_counter()
+import backend.app
+imported = time.perf_counter()
+after_import = set(sys.modules)
+app = backend.app.create_app()
+from backend.extensions import db
+with app.app_context():
+    db.create_all()
+created = time.perf_counter()
+after_create = set(sys.modules)
+client = app.test_client()
+assert client.get('/').status_code == 200
+first = time.perf_counter()
+assert client.get('/api/books/').status_code == 200
+first_api = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first - created) * 1000,
+    'first_api_request_ms': (first_api - first) * 1000,
+    'total_ms': (first_api - started) * 1000,
+    'modules_after_import': len(after_import),
+    'modules_after_create': len(after_create),
+    'loaded_after_import': sorted(after_import),
+    'loaded_after_create': sorted(after_create),
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_once():
+    """Starts one cold interpreter and returns (timings, importtime modules)."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = dict(
+            os.environ,
+            PYTHONPATH=REPO_ROOT,
+            DATABASE_URL='sqlite:///' + os.path.join(tmpdir, 'startup.db'),
+            JOBS_DB_PATH=os.path.join(tmpdir, 'jobs.db'),
+            STATS_CACHE_PATH=os.path.join(tmpdir, 'stats_cache.db'),
+            COVER_STORE_PATH=os.path.join(tmpdir, 'covers'),
+            RECS_INDEX_PATH=os.path.join(tmpdir, 'recs.bin'),
+            ASSETS_BUILD_PATH=os.path.join(tmpdir, 'assets'),
+            COVER_FETCH_ENABLED='0',
+        )
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT],
+                                   cwd=tmpdir, env=env, capture_output=True, text=True)
+    if completed.returncode:
+        sys.exit(f"Startup run failed:\n{completed.stderr[-2000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1]), parse_importtime(completed.stderr)
+
+
+def eager_modules(timing):
+    """The LAZY_AFTER_IMPORT / LAZY_AFTER_CREATE modules that one run loaded too early."""
+    eager = [name for name in LAZY_AFTER_IMPORT if name in timing['loaded_after_import']]
+    eager += [name for name in LAZY_AFTER_CREATE if name in timing['loaded_after_create']]
+    return eager
+
+
+def compare(results, baseline, threshold):
+    """Prints the change against a baseline run; returns the names of regressed checks."""
+    regressed = []
+    print(f"\nAgainst baseline (threshold +{threshold:.0%}):")
+    if results['meta']['python'] != baseline['meta'].get('python'):
+        print(f"  warning: python differs ({baseline['meta'].get('python')} -> {results['meta']['python']}), "
+              f"so the numbers are not comparable")
+    for phase in PHASES:
+        current, previous = results['phases'][phase], baseline['phases'].get(phase)
+        if previous is None:
+            print(f"  {phase:<22} new phase")
+            continue
+        change = current / previous - 1 if previous else 0.0
+        if change > threshold:
+            regressed.append(phase)
+            print(f"  {phase:<22} REGRESSION: {previous:.1f} -> {current:.1f} ms")
+        else:
+            print(f"  {phase:<22} ok ({change:+.0%})")
+    for key in ('modules_after_import', 'modules_after_create'):
+        if results[key] > baseline.get(key, results[key]):
+            print(f"  {key:<22} {baseline[key]} -> {results[key]} modules")
+    for name in results['eager']:
+        if name not in baseline.get('eager', ()):
+            regressed.append(name)
+            print(f"  {name:<22} REGRESSION: no longer imported lazily")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=7, help='Cold starts to take the median of.')
+    parser.add_argument('--top', type=int, default=15, help='Modules to list by their own import time.')
+    parser.add_argument('--save-baseline', metavar='FILE', help='Write the results to FILE as JSON.')
+    parser.add_argument('--baseline', metavar='FILE', help='Compare with results saved by --save-baseline.')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Allowed slowdown per phase (0.25 = 25%%).')
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    timings = [timing for timing, _ in runs]
+    phases = {phase: statistics.median(timing[phase] for timing in timings) for phase in PHASES}
+
+    # Own import time per module, median over the runs
+    self_us = {}
+    for _, modules in runs:
+        for name, (own, _) in modules.items():
+            self_us.setdefault(name, []).append(own)
+    heaviest = sorted(((statistics.median(values), name) for name, values in self_us.items()), reverse=True)
+    app_import = statistics.median(modules['backend.app'][1] for _, modules in runs if 'backend.app' in modules)
+
+    last = timings[-1]
+    eager = eager_modules(last)
+
+    print(f"Median of {args.runs} cold starts (python {platform.python_version()}):")
+    for phase in PHASES:
+        print(f"  {phase:<22} {phases[phase]:>8.1f} ms")
+    print(f"  {'backend.app importtime':<22} {app_import / 1000:>8.1f} ms cumulative")
+    print(f"  modules loaded: {last['modules_after_import']} after import, "
+          f"{last['modules_after_create']} after create_app()")
+    print("\nSlowest modules by own import time:")
+    for own, name in heaviest[:args.top]:
+        print(f"  {own / 1000:>7.1f} ms  {name}")
+    for name in eager:
+        print(f"warning: {name} is imported eagerly")
+
+    results = {
+        'meta': {'runs': args.runs, 'python': platform.python_version(),
+                 'created': time.strftime('%Y-%m-%dT%H:%M:%S')},
+        'phases': phases,
+        'backend_app_import_ms': app_import / 1000,
+        'modules_after_import': last['modules_after_import'],
+        'modules_after_create': last['modules_after_create'],
+        'eager': eager,
+        'slowest_modules': [{'module': name, 'self_ms': own / 1000} for own, name in heaviest[:args.top]],
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved results to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
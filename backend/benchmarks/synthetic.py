@@ -0,0 +1,114 @@
+"""Synthetic users, books and reading statuses at a configurable scale.
+
+The data is deterministic for a given seed, so a benchmark can regenerate the
+same library in memory (generate_library) to pick request targets for a server
+that was loaded earlier with populate(). Book popularity is skewed, with a few
+very popular titles and a long tail, and a book shares its author and genre
+with its neighbours. That gives the stats rollup, the search index and the
+similar-books index realistic shapes. Every user gets the API token 'token-<id>'.
+
+Load a database for a manually started server (from the repository root):
+    python -m backend.benchmarks.synthetic --database-url sqlite:////tmp/bench.db --users 1000
+"""
+import argparse
+import itertools
+import os
+import random
+import time
+
+STATUSES = ('want_to_read', 'currently_reading', 'read')
+STATUS_WEIGHTS = (3, 1, 6)
+GENRES = ('Fantasy', 'Science Fiction', 'Mystery', 'Romance', 'History', 'Biography',
+          'Horror', 'Poetry', 'Travel', 'Philosophy', 'Thriller', 'Classics')
+WORDS = ('shadow', 'river', 'empire', 'garden', 'winter', 'glass', 'crown', 'silent', 'ocean',
+         'memory', 'iron', 'paper', 'storm', 'lantern', 'northern', 'hidden', 'last', 'golden')
+BOOKS_PER_AUTHOR = 8
+INSERT_CHUNK = 50000
+
+
+def book_row(book_id, rng):
+    title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+    return (book_id, f'{title} {book_id}', f'Author {(book_id - 1) // BOOKS_PER_AUTHOR + 1}',
+            GENRES[(book_id - 1) // (BOOKS_PER_AUTHOR * 4) % len(GENRES)], rng.randint(80, 900),
+            rng.randint(1900, 2025), f'978{book_id:010d}')
+
+
+def generate_library(users, books, statuses_per_user, seed=7):
+    """Yields (user_id, book_id, status, rating, current_page, finish_date) for every reading status."""
+    rng = random.Random(seed)
+    # Zipf-like popularity: book n is picked with weight 1/n
+    cumulative = list(itertools.accumulate(1 / n for n in range(1, books + 1)))
+    per_user = min(statuses_per_user, books)
+    for user_id in range(1, users + 1):
+        chosen = set()
+        while len(chosen) < per_user:
+            chosen.update(rng.choices(range(1, books + 1), cum_weights=cumulative, k=per_user - len(chosen)))
+        for book_id in sorted(chosen):
+            status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+            rating = rng.randint(1, 5) if status == 'read' and rng.random() < 0.7 else None
+            finish = f'{rng.randint(2022, 2026)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}' \
+                if status == 'read' else None
+            current_page = rng.randint(1, 300) if status == 'currently_reading' else 0
+            yield user_id, book_id, status, rating, current_page, finish
+
+
+def populate(db, users, books, statuses_per_user, seed=7):
+    """Creates the tables in an empty database and loads the synthetic data; returns the status count."""
+    from backend.auth import hash_token
+    from backend.stats_rollup import rebuild_rollup
+
+    db.create_all()
+    rng = random.Random(seed)
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO user (id, username, email, password_hash) VALUES (?, ?, ?, ?)",
+            [(u, f'user{u}', f'user{u}@example.com', 'x') for u in range(1, users + 1)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO api_token (token_hash, user_id, created_date) VALUES (?, ?, '2024-01-01')",
+            [(hash_token(f'token-{u}'), u) for u in range(1, users + 1)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO book (id, title, author, genre, page_count, publication_year, isbn) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [book_row(b, rng) for b in range(1, books + 1)],
+        )
+
+    count = 0
+    statuses = generate_library(users, books, statuses_per_user, seed)
+    while True:
+        chunk = list(itertools.islice(statuses, INSERT_CHUNK))
+        if not chunk:
+            break
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO reading_status (user_id, book_id, status, rating, current_page, finish_date, "
+                "added_date) VALUES (?, ?, ?, ?, ?, ?, '2024-01-01')",
+                chunk,
+            )
+        count += len(chunk)
+    rebuild_rollup()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', required=True, help='Database to fill; it must be empty.')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--books', type=int, default=20000)
+    parser.add_argument('--statuses-per-user', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    from backend.app import app, db
+
+    with app.app_context():
+        started = time.perf_counter()
+        count = populate(db, args.users, args.books, args.statuses_per_user, args.seed)
+    print(f"Loaded {args.users:,} users, {args.books:,} books and {count:,} reading statuses "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
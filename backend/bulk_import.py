@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import insert, func
+
+from backend.extensions import db
+from backend.models import Book, ReadingStatus
+from backend.stats_rollup import rebuild_rollup
+from backend.conditional import bump_data_version
+from backend.covers import queue_cover_fetch
+
+# Rows per INSERT/IN statement
+IMPORT_CHUNK_SIZE = 500
+
+VALID_STATUSES = ('want_to_read', 'currently_reading', 'read')
+
+BOOK_FIELDS = ('title', 'author', 'cover_image_url', 'publication_year', 'isbn',
+               'page_count', 'description', 'genre')
+STATUS_FIELDS = ('status', 'current_page', 'rating', 'start_date', 'finish_date', 'notes')
+# (minimum, maximum) for integer status fields, shared with PUT /api/books/<id>
+STATUS_INT_BOUNDS = {'current_page': (0, None), 'rating': (1, 5)}
+
+# Goodreads library export column names mapped onto ours
+GOODREADS_COLUMNS = {
+    'Title': 'title',
+    'Author': 'author',
+    'ISBN13': 'isbn',
+    'ISBN': 'isbn',
+    'Number of Pages': 'page_count',
+    'Year Published': 'publication_year',
+    'Original Publication Year': 'publication_year',
+    'My Rating': 'rating',
+    'Exclusive Shelf': 'status',
+    'Date Read': 'finish_date',
+    'My Review': 'notes',
+}
+GOODREADS_SHELVES = {
+    'to-read': 'want_to_read',
+    'currently-reading': 'currently_reading',
+    'read': 'read',
+}
+
+
+def parse_records(text, fmt):
+    """Parses an import file into a list of dicts. fmt is 'csv', 'jsonl' or 'json'."""
+    if fmt == 'csv':
+        return [normalize_csv_row(row) for row in csv.DictReader(io.StringIO(text))]
+    if fmt == 'json':
+        data = json.loads(text)
+        return data.get('books', []) if isinstance(data, dict) else data
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def normalize_csv_row(row):
+    """Maps a CSV row (our field names or a Goodreads export) onto our field names."""
+    record = {}
+    for column, value in row.items():
+        field = column if column in BOOK_FIELDS + STATUS_FIELDS else GOODREADS_COLUMNS.get(column)
+        if not field or value is None:
+            continue
+        # Goodreads wraps ISBNs as ="0439023483"
+        value = value.strip()
+        if value.startswith('='):
+            value = value[1:].strip('"')
+        if value == '' or field in record:
+            continue
+        if column == 'Exclusive Shelf':
+            value = GOODREADS_SHELVES.get(value, value)
+        if column == 'My Rating' and value == '0':
+            continue
+        record[field] = value
+    return record
+
+
+def parse_import_date(value):
+    if value is None or isinstance(value, date):
+        return value
+    for fmt in ('%Y-%m-%d', '%Y/%m/%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f'invalid date {value!r}')
+
+
+def parse_optional_int(value, name, minimum, maximum=None):
+    """Parses an integer field (or None), accepting numeric strings; raises ValueError with a readable message."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+            raise ValueError
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer') from None
+    if number < minimum or maximum is not None and number > maximum:
+        bounds = f'between {minimum} and {maximum}' if maximum is not None else f'at least {minimum}'
+        raise ValueError(f'{name} must be {bounds}')
+    return number
+
+
+def clean_record(record):
+    """Validates one record and converts its values; raises ValueError with a readable message."""
+    if not isinstance(record, dict):
+        raise ValueError('row must be an object')
+    if not record.get('title') or not record.get('author'):
+        raise ValueError('missing required fields: title and author')
+
+    book = {field: record.get(field) for field in BOOK_FIELDS}
+    for field in ('publication_year', 'page_count'):
+        if book[field] is not None:
+            book[field] = int(book[field])
+    if book['isbn'] is not None:
+        book['isbn'] = str(book['isbn'])
+
+    # A missing status stays None so a re-import keeps the current one (see upsert_statement)
+    status = {field: record.get(field) for field in STATUS_FIELDS}
+    status['status'] = status['status'] or None
+    if status['status'] is not None and status['status'] not in VALID_STATUSES:
+        raise ValueError(f"invalid status {status['status']!r}")
+    for field, (minimum, maximum) in STATUS_INT_BOUNDS.items():
+        status[field] = parse_optional_int(status[field], field, minimum, maximum)
+    for field in ('start_date', 'finish_date'):
+        status[field] = parse_import_date(status[field])
+    return book, status
+
+
+def upsert_statement(dialect_name, keep_status=False):
+    """INSERT ... ON CONFLICT (user_id, book_id) DO UPDATE for reading statuses.
+
+    Imported values win; columns the import leaves empty keep their current value.
+    status is NOT NULL, so rows without one are inserted as 'want_to_read' through a
+    second statement (keep_status=True) whose update leaves an existing status alone.
+    """
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(ReadingStatus)
+    set_ = {field: func.coalesce(stmt.excluded[field], ReadingStatus.__table__.c[field])
+            for field in STATUS_FIELDS if field != 'status'}
+    if not keep_status:
+        set_['status'] = stmt.excluded.status
+    return stmt.on_conflict_do_update(index_elements=['user_id', 'book_id'], set_=set_)
+
+
+def import_books(user_id, records, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """Imports records for a user in chunks inside one transaction.
+
+    Existing books are matched by ISBN with one IN query per chunk, new books are
+    inserted with a single executemany, and reading statuses are upserted.
+    progress(done, total) is called after every chunk if given.
+    Returns a report with counts and per-row errors (row numbers start at 1).
+    """
+    report = {'imported': 0, 'created_books': 0, 'errors': []}
+    new_covers = []
+    upsert = upsert_statement(db.engine.dialect.name)
+    upsert_keep_status = upsert_statement(db.engine.dialect.name, keep_status=True)
+
+    try:
+        for start in range(0, len(records), chunk_size):
+            rows = []
+            for offset, record in enumerate(records[start:start + chunk_size]):
+                try:
+                    rows.append(clean_record(record))
+                except (TypeError, ValueError) as e:
+                    report['errors'].append({'row': start + offset + 1, 'message': str(e)})
+            if not rows:
+                continue
+
+            isbns = {book['isbn'] for book, _ in rows if book['isbn']}
+            book_ids_by_isbn = dict(
+                db.session.query(Book.isbn, Book.id).filter(Book.isbn.in_(isbns)).all()
+            ) if isbns else {}
+
+            # Insert books that are new, once per ISBN within the chunk
+            new_books = []
+            new_isbns = set()
+            for book, _ in rows:
+                if book['isbn'] and (book['isbn'] in book_ids_by_isbn or book['isbn'] in new_isbns):
+                    continue
+                new_books.append(book)
+                new_isbns.add(book['isbn'])
+            if new_books:
+                inserted = db.session.execute(
+                    insert(Book).returning(Book.id, sort_by_parameter_order=True), new_books
+                ).scalars().all()
+                for book, book_id in zip(new_books, inserted):
+                    book['id'] = book_id
+                    if book['cover_image_url']:
+                        new_covers.append((book_id, book['cover_image_url']))
+                    if book['isbn']:
+                        book_ids_by_isbn[book['isbn']] = book_id
+                report['created_books'] += len(new_books)
+
+            # One status per book per statement; a later row for the same book wins
+            statuses = {}
+            for book, status in rows:
+                book_id = book_ids_by_isbn[book['isbn']] if book['isbn'] else book['id']
+                statuses[book_id] = dict(status, user_id=user_id, book_id=book_id)
+            with_status = [row for row in statuses.values() if row['status'] is not None]
+            without_status = [dict(row, status='want_to_read') for row in statuses.values()
+                              if row['status'] is None]
+            if with_status:
+                db.session.execute(upsert, with_status)
+            if without_status:
+                db.session.execute(upsert_keep_status, without_status)
+            report['imported'] += len(rows)
+            if progress:
+                progress(min(start + chunk_size, len(records)), len(records))
+
+        if report['imported']:
+            # Bulk upserts bypass the incremental rollup updates, so recompute this user's
+            rebuild_rollup(user_id, commit=False)
+            bump_data_version(user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Cover downloads run in the background once the books are committed
+    for book_id, url in new_covers:
+        queue_cover_fetch(book_id, url)
+    return report
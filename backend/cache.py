@@ -0,0 +1,189 @@
+"""Response cache for the stats endpoints.
+
+Backends:
+- 'sqlite' (default): a small SQLite file shared by every worker on the host.
+- 'memory': in-process LRU with a TTL (default when the database itself is in memory).
+- 'none': caching disabled.
+
+Configure with STATS_CACHE_BACKEND, STATS_CACHE_TTL (seconds),
+STATS_CACHE_MAXSIZE (memory backend) and STATS_CACHE_PATH (sqlite backend).
+Entries are keyed per user and per data version (see backend/conditional.py).
+Every write bumps the version in the database, so older entries are never served
+again, in any worker or on any host. invalidate_user_stats() only frees them
+early in the cache that saw the change; elsewhere they expire after
+STATS_CACHE_TTL or are evicted.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy.engine import make_url
+
+
+class CacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def count(self, field):
+        with self.lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'invalidations': self.invalidations}
+
+
+class NullCache:
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key):
+        self.stats.count('misses')
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete_prefix(self, prefix):
+        pass
+
+
+class MemoryCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                value = entry[1]
+            else:
+                if entry is not None:
+                    del self.entries[key]
+                value = None
+        self.stats.count('hits' if value is not None else 'misses')
+        return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+        self.stats.count('invalidations')
+
+
+class SQLiteCache:
+    """Cache stored in a local SQLite file so all workers on a host share entries.
+
+    The file is opened (and created) on first use, not when the app is built.
+    """
+
+    def __init__(self, path, ttl=300):
+        self.path = path
+        self.ttl = ttl
+        self.local = threading.local()
+        self.stats = CacheStats()
+
+    def after_fork(self):
+        # SQLite connections must not be shared with the parent process
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')  # it's a cache; losing it on a crash is fine
+            with connection:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)'
+                )
+            self.local.connection = connection
+        return connection
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND expires > ?', (key, time.time())
+        ).fetchone()
+        self.stats.count('hits' if row else 'misses')
+        return bytes(row[0]) if row else None
+
+    def set(self, key, value):
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+                               (key, value, time.time() + self.ttl))
+
+    def delete_prefix(self, prefix):
+        # Prefix match as a range scan on the primary key
+        with self._connection() as connection:
+            connection.execute('DELETE FROM cache WHERE key >= ? AND key < ?', (prefix, prefix + '\uffff'))
+        self.stats.count('invalidations')
+
+
+def is_memory_database(uri):
+    """True for an in-memory SQLite database, which only one process can ever use."""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def init_cache(app):
+    """Creates the app's stats cache from app config / environment."""
+    app.config.setdefault('STATS_CACHE_BACKEND', os.environ.get(
+        'STATS_CACHE_BACKEND', 'memory' if is_memory_database(app.config['SQLALCHEMY_DATABASE_URI']) else 'sqlite'))
+    app.config.setdefault('STATS_CACHE_TTL', int(os.environ.get('STATS_CACHE_TTL', 300)))
+    app.config.setdefault('STATS_CACHE_MAXSIZE', int(os.environ.get('STATS_CACHE_MAXSIZE', 1024)))
+    app.config.setdefault('STATS_CACHE_PATH', os.environ.get(
+        'STATS_CACHE_PATH', os.path.join(app.instance_path, 'stats_cache.db')))
+
+    backend = app.config['STATS_CACHE_BACKEND']
+    if backend == 'memory':
+        stats_cache = MemoryCache(app.config['STATS_CACHE_MAXSIZE'], app.config['STATS_CACHE_TTL'])
+    elif backend == 'sqlite':
+        stats_cache = SQLiteCache(app.config['STATS_CACHE_PATH'], app.config['STATS_CACHE_TTL'])
+    elif backend == 'none':
+        stats_cache = NullCache()
+    else:
+        raise ValueError(f'Unknown STATS_CACHE_BACKEND {backend!r}')
+    app.extensions['stats_cache'] = stats_cache
+
+
+def get_stats_cache():
+    return current_app.extensions['stats_cache']
+
+
+def user_stats_prefix(user_id):
+    return f'stats:{user_id}:'
+
+
+def render_metrics():
+    """Hit/miss/invalidation counters in Prometheus text format (for /api/_metrics)."""
+    lines = []
+    for field, value in get_stats_cache().stats.as_dict().items():
+        name = f'booktracker_stats_cache_{field}_total'
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {value}')
+    return lines
+
+
+def invalidate_user_stats(user_id):
+    """Drops every cached stats response for one user."""
+    get_stats_cache().delete_prefix(user_stats_prefix(user_id))
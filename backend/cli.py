@@ -0,0 +1,235 @@
+"""The `flask` commands, registered on every app by create_app()."""
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import inspect
+
+from backend.extensions import db
+
+
+# CLI command to create database tables
+@click.command("create-db")
+@with_appcontext
+def create_db_command():
+    """Creates the database tables."""
+    db.create_all()
+    click.echo("Initialized the database and created tables.")
+
+    # Databases created before full-text search have a book table but no index
+    from backend.search import ensure_search_index
+    with db.engine.begin() as connection:
+        if ensure_search_index(connection):
+            click.echo("Created and filled the book search index.")
+
+    # Create a default user if one doesn't exist
+    from backend.models import User # Import User model here to avoid circular dependency at top level
+    default_user = User.query.get(1)
+    if not default_user:
+        default_user = User(
+            id=1, 
+            username='default_user', 
+            email='default@example.com', 
+            password_hash='default_password_hash' # In a real app, hash this properly
+        )
+        db.session.add(default_user)
+        db.session.commit()
+        click.echo("Created default user (id=1).")
+    else:
+        click.echo("Default user (id=1) already exists.")
+
+# CLI command to add missing indexes to an existing database in place
+@click.command("migrate-indexes")
+@with_appcontext
+def migrate_indexes_command():
+    """Creates any indexes declared on the models that the database is missing."""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            click.echo(f"Table {table.name} does not exist; run create-db first.")
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                click.echo(f"Index {index.name} already exists.")
+                continue
+            index.create(bind=db.engine)
+            click.echo(f"Created index {index.name} on {table.name}.")
+
+    # Refresh the planner statistics so SQLite picks up the new indexes
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+        click.echo("Updated query planner statistics.")
+
+# CLI command to backfill and verify the monthly stats rollup
+@click.command("rebuild-stats")
+@with_appcontext
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user (default: all users).')
+@click.option('--verify-only', is_flag=True, help='Report mismatches without rewriting the table.')
+def rebuild_stats_command(user_id, verify_only):
+    """Recomputes the monthly_reading_stats rollup from reading_status."""
+    from backend.stats_rollup import diff_rollup, rebuild_rollup
+    if verify_only:
+        _, mismatched = diff_rollup(user_id)
+    else:
+        mismatched = rebuild_rollup(user_id)
+
+    for uid, year, month in mismatched:
+        click.echo(f"Mismatch for user {uid}, {year:04d}-{month:02d}")
+    if verify_only:
+        click.echo(f"Verified stats rollup: {len(mismatched)} mismatched month(s).")
+    else:
+        click.echo(f"Rebuilt stats rollup: {len(mismatched)} month(s) corrected.")
+    if verify_only and mismatched:
+        raise SystemExit(1)
+
+# CLI command to import a library file (CSV, Goodreads export, JSON or JSON lines)
+@click.command("import-books")
+@with_appcontext
+@click.argument('file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user-id', type=int, default=1, help='User the books are added for.')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl', 'json']), default=None,
+              help='File format (default: guessed from the extension).')
+def import_books_command(file, user_id, fmt):
+    """Bulk-imports books and reading statuses from a file."""
+    from backend.bulk_import import parse_records, import_books
+    if fmt is None:
+        extension = file.rsplit('.', 1)[-1].lower()
+        fmt = extension if extension in ('csv', 'json') else 'jsonl'
+
+    with open(file, encoding='utf-8-sig') as f:
+        records = parse_records(f.read(), fmt)
+
+    report = import_books(user_id, records)
+
+    for error in report['errors']:
+        click.echo(f"Row {error['row']}: {error['message']}")
+    click.echo(f"Imported {report['imported']} book(s), {report['created_books']} new, "
+               f"{len(report['errors'])} error(s).")
+
+# CLI command to (re)build the full-text search index
+@click.command("build-search-index")
+@with_appcontext
+def build_search_index_command():
+    """Creates the book full-text search index if missing and re-indexes every book."""
+    from backend.search import create_search_index, rebuild_search_index
+    if db.engine.dialect.name != 'sqlite':
+        click.echo("Full-text index is SQLite-only; search falls back to substring matching.")
+        return
+    with db.engine.begin() as connection:
+        create_search_index(connection)
+        rebuild_search_index(connection)
+    click.echo("Rebuilt the book search index.")
+
+# CLI command to issue an API token for a user
+@click.command("create-token")
+@with_appcontext
+@click.option('--user-id', type=int, default=1, help='User the token authenticates as.')
+def create_token_command(user_id):
+    """Creates an API token (send it as 'Authorization: Bearer <token>')."""
+    from backend.auth import create_token
+    from backend.models import User
+    if not User.query.get(user_id):
+        raise click.ClickException(f"User {user_id} does not exist.")
+    click.echo(create_token(user_id))
+
+# CLI command to cache covers for books that still point at remote URLs
+@click.command("fetch-covers")
+@with_appcontext
+@click.option('--workers', type=int, default=None, help='Concurrent downloads (default: COVER_FETCH_WORKERS).')
+def fetch_covers_command(workers):
+    """Downloads and thumbnails every remote book cover, waiting until all are done."""
+    from backend.covers import CoverFetcher, CoverStore
+    from backend.models import Book
+    app = current_app._get_current_object()
+    fetcher = CoverFetcher(app, CoverStore(app.config['COVER_STORE_PATH']),
+                           workers or app.config['COVER_FETCH_WORKERS'])
+    books = db.session.query(Book.id, Book.cover_image_url).filter(
+        Book.cover_image_url.like('http%')
+    ).all()
+    futures = [fetcher.submit(book_id, url) for book_id, url in books]
+    cached = sum(1 for future in futures if future is not None and future.result())
+    fetcher.shutdown()
+    click.echo(f"Cached {cached} of {len(books)} remote cover(s).")
+
+# CLI command to run queued background jobs
+@click.command("worker")
+@with_appcontext
+@click.option('--processes', type=int, default=None,
+              help='Size of the process pool for CPU-heavy steps (default: JOB_WORKER_PROCESSES, 0 = inline).')
+@click.option('--poll-interval', type=float, default=None,
+              help='Seconds to wait when the queue is empty (default: JOB_POLL_INTERVAL).')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty instead of waiting for more jobs.')
+def worker_command(processes, poll_interval, burst):
+    """Runs queued background jobs until interrupted."""
+    from backend.jobs import run_worker
+    app = current_app._get_current_object()
+    if processes is None:
+        processes = app.config['JOB_WORKER_PROCESSES']
+    if poll_interval is None:
+        poll_interval = app.config['JOB_POLL_INTERVAL']
+    click.echo(f"Worker started with {processes} process(es); waiting for jobs.")
+    try:
+        count = run_worker(app, processes, poll_interval, burst=burst)
+    except KeyboardInterrupt:
+        click.echo("Worker stopped.")
+        return
+    click.echo(f"Ran {count} job(s); the queue is empty.")
+
+# CLI command to export a user's library
+@click.command("export-books")
+@with_appcontext
+@click.option('--user-id', type=int, default=1, help='User whose library is exported.')
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']), default='jsonl', help='Output format.')
+@click.option('--output', type=click.File('wb'), default='-', help='Output file (default: stdout).')
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip-compress the output.')
+def export_books_command(user_id, fmt, output, compress):
+    """Streams a library export (the import format, so it can be re-imported)."""
+    from backend.export import write_export
+    rows = write_export(user_id, fmt, output, compress=compress)
+    click.echo(f"Exported {rows} book(s).", err=True)
+
+# CLI command to (re)build the similar-books index
+@click.command("build-recs")
+@with_appcontext
+@click.option('--incremental', is_flag=True,
+              help='Only recompute books touched by new reading statuses or by added, deleted or edited books.')
+@click.option('--top-k', type=int, default=None, help='Similar books kept per book (default: RECS_TOP_K).')
+def build_recs_command(incremental, top_k):
+    """Builds the similar-books index used by /similar and /api/recommendations."""
+    from backend.recommendations import build_index
+    computed = build_index(current_app.config['RECS_INDEX_PATH'], top_k or current_app.config['RECS_TOP_K'],
+                           incremental=incremental)
+    click.echo(f"Computed similar books for {computed} book(s).")
+
+# CLI command to fingerprint and precompress the frontend
+@click.command("build-assets")
+@with_appcontext
+@click.option('--clean', is_flag=True, help='Remove files left over from earlier builds.')
+def build_assets_command(clean):
+    """Builds the hashed, gzip/brotli-compressed pages and scripts served from /assets."""
+    from backend.assets import brotli, build_assets
+    manifest = build_assets(current_app.config['ASSETS_BUILD_PATH'], clean=clean)
+    encodings = 'gzip and brotli' if brotli else 'gzip (install brotli for .br variants)'
+    click.echo(f"Built {len(manifest['assets'])} asset(s) and {len(manifest['pages'])} page(s) "
+               f"with {encodings} into {current_app.config['ASSETS_BUILD_PATH']}.")
+
+
+COMMANDS = (
+    create_db_command,
+    migrate_indexes_command,
+    rebuild_stats_command,
+    import_books_command,
+    build_search_index_command,
+    create_token_command,
+    fetch_covers_command,
+    worker_command,
+    export_books_command,
+    build_recs_command,
+    build_assets_command,
+)
+
+
+def register_commands(app):
+    for command in COMMANDS:
+        app.cli.add_command(command)
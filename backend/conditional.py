@@ -0,0 +1,70 @@
+import hashlib
+from functools import wraps
+
+from flask import request, make_response
+
+from backend.extensions import db
+from backend.models import ReadingStatus, UserDataVersion
+from backend.auth import current_user_id
+
+
+def get_data_version(user_id):
+    """Returns the user's current data version (0 if they have never written anything)."""
+    version = db.session.query(UserDataVersion.version).filter_by(user_id=user_id).scalar()
+    return version or 0
+
+
+def bump_data_version(user_id):
+    """Increments the user's data version in the current session.
+
+    Call this from every write path before committing, so the new version is
+    committed together with the change and cached ETags stop matching.
+    """
+    row = UserDataVersion.query.get(user_id)
+    if not row:
+        row = UserDataVersion(user_id=user_id, version=0)
+        db.session.add(row)
+    row.version += 1
+
+
+def bump_book_readers_data_version(book_id):
+    """Bumps the data version of every user with a status for the book, in the current session.
+
+    For changes to a shared book row (such as its cover) that show up in all of
+    their book lists. Costs two queries whatever the number of readers.
+    """
+    user_ids = [user_id for (user_id,) in db.session.query(ReadingStatus.user_id).filter_by(book_id=book_id)]
+    if not user_ids:
+        return
+    rows = {row.user_id: row for row in UserDataVersion.query.filter(UserDataVersion.user_id.in_(user_ids))}
+    for user_id in user_ids:
+        row = rows.get(user_id)
+        if row is None:
+            row = UserDataVersion(user_id=user_id, version=0)
+            db.session.add(row)
+        row.version += 1
+
+
+def make_etag(user_id, version):
+    # The body depends on the endpoint and its query string as well as the data version
+    key = f'{user_id}:{version}:{request.full_path}'
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def conditional_get(view):
+    """Decorator that answers If-None-Match with 304 before the view runs any other query."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = current_user_id()
+        etag = make_etag(user_id, get_data_version(user_id))
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        # Let browsers store the body but revalidate it on every visit
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return wrapper
@@ -0,0 +1,300 @@
+"""Background cover downloads and the local thumbnail store.
+
+New and imported books with a remote cover_image_url are queued on a small
+thread pool. Each job downloads the image with retries, resizes it to a
+thumbnail (when Pillow is installed), and stores it under COVER_STORE_PATH by
+the SHA-256 of its bytes. The job then points Book.cover_image_url at
+/covers/<hash>, so the frontend stops hotlinking third-party hosts. The original
+URL is kept in book_cover.
+
+Any API user can set a cover URL, so downloads only connect to public addresses
+(checked on the resolved IP of every connection, redirects included), require an
+image/* Content-Type, and only store bytes that decode as an image.
+
+Settings: COVER_FETCH_ENABLED (default on), COVER_FETCH_WORKERS, COVER_STORE_PATH.
+"""
+import hashlib
+import http.client
+import io
+import ipaddress
+import logging
+import os
+import re
+import socket
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Blueprint, abort, current_app, send_file
+
+from backend.extensions import db
+from backend.models import Book, BookCover
+from backend.conditional import bump_book_readers_data_version
+
+logger = logging.getLogger('backend.covers')
+
+THUMBNAIL_SIZE = (256, 384)
+MAX_COVER_BYTES = 5 * 1024 * 1024
+FETCH_TIMEOUT = 10
+FETCH_ATTEMPTS = 3
+RETRY_BACKOFF = 0.5  # seconds, doubled after every failed attempt
+COVER_URL_PREFIX = '/covers/'
+HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Served covers never change (the name is their hash), so let browsers keep them for a year
+COVER_MAX_AGE = 365 * 24 * 3600
+
+covers_bp = Blueprint('covers_bp', __name__, url_prefix='/covers')
+
+
+class CoverStore:
+    """Content-addressed files: <root>/<first two hash chars>/<hash>."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path_for(self, content_hash):
+        return os.path.join(self.root, content_hash[:2], content_hash)
+
+    def put(self, data):
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self.path_for(content_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return content_hash
+
+
+class RejectedCover(ValueError):
+    """A cover URL or response that must not be stored; retrying won't help."""
+
+
+def make_thumbnail(data):
+    """Shrinks an image to fit THUMBNAIL_SIZE as JPEG; raises RejectedCover if data isn't an image.
+
+    Without Pillow the data is stored as downloaded, but only if it starts like a
+    JPEG, PNG, GIF or WebP file.
+    """
+    # Pillow is optional, and imported here because only the fetcher threads need it
+    try:
+        from PIL import Image, UnidentifiedImageError
+    except ImportError:
+        if sniff_image_type(data) is None:
+            raise RejectedCover('download is not a JPEG, PNG, GIF or WebP image')
+        return data
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError, SyntaxError, ValueError) as e:
+        raise RejectedCover(f'download is not a readable image ({e})') from None
+    with image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        output = io.BytesIO()
+        image.convert('RGB').save(output, format='JPEG', quality=85, optimize=True)
+        return output.getvalue()
+
+
+def sniff_image_type(head):
+    """The image mimetype of a file from its first bytes, or None."""
+    if head.startswith(b'\xff\xd8'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG'):
+        return 'image/png'
+    if head.startswith(b'GIF8'):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def sniff_mimetype(path):
+    with open(path, 'rb') as f:
+        return sniff_image_type(f.read(12)) or 'application/octet-stream'
+
+
+def is_public_address(ip):
+    address = ipaddress.ip_address(ip.split('%', 1)[0])  # drop an IPv6 zone id
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    return address.is_global and not address.is_multicast
+
+
+def create_public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """socket.create_connection that refuses hosts resolving to private, loopback or link-local addresses.
+
+    It connects to the address it checked, so a second DNS answer can't swap in another one.
+    """
+    host, port = address
+    resolved = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    for *_, sockaddr in resolved:
+        if not is_public_address(sockaddr[0]):
+            raise RejectedCover(f'{host} resolves to non-public address {sockaddr[0]}')
+    error = None
+    for *_, sockaddr in resolved:
+        try:
+            return socket.create_connection(sockaddr[:2], timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error or OSError(f'could not resolve {host}')
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = create_public_connection
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = create_public_connection
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+class HTTPOnlyRedirectHandler(urllib.request.HTTPRedirectHandler):
+    max_redirections = 5
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        if not newurl.startswith(('http://', 'https://')):
+            raise RejectedCover(f'redirect to non-HTTP URL {newurl}')
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# No proxies: the address checks above only mean something for direct connections
+cover_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), PublicHTTPHandler, PublicHTTPSHandler, HTTPOnlyRedirectHandler)
+
+
+def download(url):
+    """Fetches url with retries and exponential backoff; raises the last error."""
+    delay = RETRY_BACKOFF
+    for attempt in range(1, FETCH_ATTEMPTS + 1):
+        try:
+            request = urllib.request.Request(url, headers={'User-Agent': 'BookTracker cover fetcher'})
+            with cover_opener.open(request, timeout=FETCH_TIMEOUT) as response:
+                content_type = response.headers.get_content_type()
+                if not content_type.startswith('image/'):
+                    raise RejectedCover(f'response is {content_type}, not an image')
+                data = response.read(MAX_COVER_BYTES + 1)
+            if len(data) > MAX_COVER_BYTES:
+                raise RejectedCover(f'cover larger than {MAX_COVER_BYTES} bytes')
+            return data
+        except Exception as e:
+            # Client errors (404, 403...) and rejected covers won't go away by retrying
+            client_error = isinstance(e, urllib.error.HTTPError) and 400 <= e.code < 500
+            if client_error or isinstance(e, RejectedCover) or attempt == FETCH_ATTEMPTS:
+                raise
+            time.sleep(delay)
+            delay *= 2
+
+
+class CoverFetcher:
+    """Bounded thread pool that caches covers in the background.
+
+    The pool is created on first use, so processes forked from a preloaded app
+    don't inherit worker threads.
+    """
+
+    def __init__(self, app, store, workers):
+        self.app = app
+        self.store = store
+        self.workers = workers
+        self.executor = None
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def submit(self, book_id, url):
+        """Queues a cover download; returns a Future, or None if already queued or not remote."""
+        if not url or not url.startswith(('http://', 'https://')):
+            return None
+        with self.lock:
+            if book_id in self.pending:
+                return None
+            self.pending.add(book_id)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix='cover-fetch')
+        return self.executor.submit(self._fetch, book_id, url)
+
+    def _fetch(self, book_id, url):
+        try:
+            content_hash = self.store.put(make_thumbnail(download(url)))
+            with self.app.app_context():
+                book = Book.query.get(book_id)
+                # Skip if the book's cover changed while we were downloading
+                if book is None or book.cover_image_url != url:
+                    return None
+                cover = BookCover.query.get(book_id) or BookCover(book_id=book_id)
+                cover.source_url = url
+                cover.content_hash = content_hash
+                db.session.add(cover)
+                book.cover_image_url = COVER_URL_PREFIX + content_hash
+                # Readers' cached book lists and details still show the remote URL
+                bump_book_readers_data_version(book_id)
+                db.session.commit()
+            return content_hash
+        except Exception:
+            logger.exception('Failed to cache cover for book %s from %s', book_id, url)
+            return None
+        finally:
+            with self.lock:
+                self.pending.discard(book_id)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def after_fork(self):
+        # The pool's threads don't survive a fork; the child starts its own on first use
+        self.executor = None
+        self.pending = set()
+        self.lock = threading.Lock()
+
+
+def queue_cover_fetch(book_id, url):
+    """Queues a background cover download if fetching is enabled."""
+    cover_fetcher = current_app.extensions.get('cover_fetcher')
+    if cover_fetcher is not None:
+        return cover_fetcher.submit(book_id, url)
+    return None
+
+
+@covers_bp.route('/<content_hash>', methods=['GET'])
+def get_cover(content_hash):
+    if not HASH_PATTERN.match(content_hash):
+        abort(404)
+    path = CoverStore(current_app.config['COVER_STORE_PATH']).path_for(content_hash)
+    if not os.path.exists(path):
+        abort(404)
+    # conditional=True handles If-None-Match and Range; the WSGI server can use sendfile
+    response = send_file(path, mimetype=sniff_mimetype(path), conditional=True,
+                         etag=content_hash, max_age=COVER_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={COVER_MAX_AGE}, immutable'
+    return response
+
+
+def init_covers(app):
+    """Reads the cover settings, registers the /covers route and sets up the fetcher."""
+    app.config.setdefault('COVER_FETCH_ENABLED', os.environ.get('COVER_FETCH_ENABLED', '1') == '1')
+    app.config.setdefault('COVER_FETCH_WORKERS', int(os.environ.get('COVER_FETCH_WORKERS', 4)))
+    app.config.setdefault('COVER_STORE_PATH', os.environ.get(
+        'COVER_STORE_PATH', os.path.join(app.instance_path, 'covers')))
+    app.register_blueprint(covers_bp)
+    if app.config['COVER_FETCH_ENABLED']:
+        app.extensions['cover_fetcher'] = CoverFetcher(app, CoverStore(app.config['COVER_STORE_PATH']),
+                                                       app.config['COVER_FETCH_WORKERS'])
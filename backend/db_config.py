@@ -0,0 +1,68 @@
+import os
+
+from sqlalchemy import event
+
+DEFAULT_DATABASE_URI = 'sqlite:///booktracker.db'
+
+# SQLite connection pragmas, overridable through the environment (see sqlite_pragmas_from_env)
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',      # readers no longer block the writer (and vice versa)
+    'synchronous': 'NORMAL',    # safe with WAL, avoids an fsync on every commit
+    'busy_timeout': 5000,       # ms to wait on a locked database instead of failing at once
+    'cache_size': -64000,       # negative = KiB, so ~64 MB of page cache per connection
+    'mmap_size': 268435456,     # read pages through a 256 MB memory map
+    'temp_store': 'MEMORY',     # temp tables and sort spills stay in RAM
+}
+
+
+def database_uri_from_env():
+    uri = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URI)
+    # Some hosts still hand out the pre-SQLAlchemy-1.4 scheme
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def sqlite_pragmas_from_env():
+    """Default pragmas, each overridable as SQLITE_<NAME> (e.g. SQLITE_BUSY_TIMEOUT=10000)."""
+    return {
+        name: os.environ.get(f'SQLITE_{name.upper()}', default)
+        for name, default in DEFAULT_SQLITE_PRAGMAS.items()
+    }
+
+
+def engine_options_from_env(uri):
+    """Pool settings for SQLALCHEMY_ENGINE_OPTIONS; in-memory SQLite keeps SQLAlchemy's defaults."""
+    if uri in ('sqlite://', 'sqlite:///') or ':memory:' in uri:
+        return {}
+    options = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+    if not uri.startswith('sqlite'):
+        # Server databases drop idle connections; check and recycle them
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    return options
+
+
+def configure_database(app):
+    """Fills in the database settings on app.config unless they are already set."""
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_uri_from_env())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS',
+                          engine_options_from_env(app.config['SQLALCHEMY_DATABASE_URI']))
+    app.config.setdefault('SQLITE_PRAGMAS', sqlite_pragmas_from_env())
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Runs the pragmas on every new DB-API connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
@@ -0,0 +1,103 @@
+"""Library export as JSON lines or CSV, streamed in constant memory.
+
+Rows come from a server-side cursor in batches of EXPORT_BATCH_SIZE and are
+encoded one batch at a time, so neither the rows nor the output are ever held
+in full. The columns are the import field names (see bulk_import), so an export
+can be imported again with `flask import-books` or POST /api/books/bulk.
+"""
+import csv
+import io
+import json
+import zlib
+
+from sqlalchemy import String, select, type_coerce
+
+from backend.extensions import db
+from backend.models import Book, ReadingStatus
+from backend.bulk_import import BOOK_FIELDS, STATUS_FIELDS
+
+EXPORT_FORMATS = ('jsonl', 'csv')
+EXPORT_MIMETYPES = {'jsonl': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_STATUS_FIELDS = STATUS_FIELDS + ('added_date',)
+EXPORT_FIELDS = BOOK_FIELDS + EXPORT_STATUS_FIELDS
+DATE_FIELDS = ('start_date', 'finish_date', 'added_date')
+
+
+def export_query(user_id):
+    """SELECT of plain row tuples in EXPORT_FIELDS order, fetched through a server-side cursor."""
+    columns = [getattr(Book, f) for f in BOOK_FIELDS] + [
+        # Dates as their stored text, so SQLite rows skip date parsing
+        type_coerce(getattr(ReadingStatus, f), String) if f in DATE_FIELDS else getattr(ReadingStatus, f)
+        for f in EXPORT_STATUS_FIELDS
+    ]
+    return select(*columns).join(
+        ReadingStatus, Book.id == ReadingStatus.book_id
+    ).where(ReadingStatus.user_id == user_id).order_by(ReadingStatus.id).execution_options(
+        yield_per=EXPORT_BATCH_SIZE
+    )
+
+
+def row_values(row):
+    # Other databases hand back date objects even through the String coercion
+    return [value.isoformat() if hasattr(value, 'isoformat') else value for value in row]
+
+
+def iter_export(user_id, fmt, progress=None):
+    """Yields the export as text, one chunk per batch of rows.
+
+    progress(rows_done) is called after every batch if given.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown export format {fmt!r}')
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if fmt == 'csv':
+        writer.writerow(EXPORT_FIELDS)
+        yield buffer.getvalue()
+
+    done = 0
+    for batch in db.session.execute(export_query(user_id)).partitions():
+        buffer.seek(0)
+        buffer.truncate()
+        if fmt == 'csv':
+            writer.writerows(row_values(row) for row in batch)
+        else:
+            for row in batch:
+                buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, row_values(row))), ensure_ascii=False))
+                buffer.write('\n')
+        done += len(batch)
+        yield buffer.getvalue()
+        if progress:
+            progress(done)
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip-compresses a stream of text chunks, flushing after each so bytes go out straight away."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_row_count(user_id):
+    return ReadingStatus.query.filter_by(user_id=user_id).count()
+
+
+def write_export(user_id, fmt, file, compress=False, progress=None):
+    """Writes a whole export to a binary file object; returns the number of rows written."""
+    rows = 0
+
+    def count(done):
+        nonlocal rows
+        rows = done
+        if progress:
+            progress(done)
+
+    chunks = iter_export(user_id, fmt, progress=count)
+    for data in gzip_chunks(chunks) if compress else (chunk.encode('utf-8') for chunk in chunks):
+        file.write(data)
+    return rows
@@ -0,0 +1,5 @@
+from flask_sqlalchemy import SQLAlchemy
+
+# Created unbound and attached to each app by create_app(), so models and helpers can
+# import it without importing (and building) the app itself
+db = SQLAlchemy()
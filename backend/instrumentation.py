@@ -0,0 +1,191 @@
+"""Opt-in request performance instrumentation.
+
+Enable with PERF_INSTRUMENTATION=1 (or app.config['PERF_INSTRUMENTATION'] = True).
+When on, every request records its SQL statement count, DB time and
+serialization time. It also gets a Server-Timing header, statements slower
+than SLOW_QUERY_MS go to the 'backend.slow_queries' logger, and a warning is
+logged when one request runs the same statement more than N_PLUS_ONE_THRESHOLD
+times. Aggregated histograms are served in Prometheus text format from
+/api/_metrics.
+"""
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from flask import Blueprint, Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from backend.json_provider import FastJSONProvider
+
+slow_query_logger = logging.getLogger('backend.slow_queries')
+n_plus_one_logger = logging.getLogger('backend.n_plus_one')
+
+# Histogram bucket upper bounds
+DURATION_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+metrics_bp = Blueprint('metrics_bp', __name__, url_prefix='/api/_metrics')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum:.3f}')
+        lines.append(f'{name}_count{{{labels}}} {self.total}')
+        return lines
+
+
+class MetricsRegistry:
+    """Per-endpoint histograms of one app, shared by the threads of its process."""
+
+    # (metric name, help text, request record key, buckets)
+    METRICS = (
+        ('booktracker_request_duration_ms', 'Total request time in milliseconds.', 'total_ms', DURATION_BUCKETS_MS),
+        ('booktracker_db_duration_ms', 'Time spent in SQL per request in milliseconds.', 'db_ms', DURATION_BUCKETS_MS),
+        ('booktracker_serialization_duration_ms', 'Time spent building the response body in milliseconds.',
+         'serialize_ms', DURATION_BUCKETS_MS),
+        ('booktracker_db_queries', 'SQL statements executed per request.', 'queries', QUERY_COUNT_BUCKETS),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        # Callables returning extra Prometheus text lines (e.g. cache counters)
+        self.collectors = []
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def record(self, endpoint, values):
+        with self.lock:
+            for name, _, key, buckets in self.METRICS:
+                histogram = self.histograms.setdefault((name, endpoint), Histogram(buckets))
+                histogram.observe(values[key])
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name, help_text, _, _ in self.METRICS:
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, endpoint), histogram in sorted(self.histograms.items()):
+                    if metric == name:
+                        lines.extend(histogram.render(name, f'endpoint="{endpoint}"'))
+        for collector in self.collectors:
+            lines.extend(collector())
+        return '\n'.join(lines) + '\n'
+
+
+@metrics_bp.route('', methods=['GET'])
+def get_metrics():
+    return Response(current_app.extensions['metrics_registry'].render(), mimetype='text/plain; version=0.0.4')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the statement's execution context rather than the pooled connection, so a
+    # statement that fails (and never reaches after_cursor_execute) leaves nothing behind
+    if has_request_context() and 'perf' in g:
+        context.perf_query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'perf_query_start', None)
+    if started is None or not (has_request_context() and 'perf' in g):
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    perf = g.perf
+    perf['queries'] += 1
+    perf['db_ms'] += elapsed_ms
+    perf['statements'][statement] += 1
+    if elapsed_ms >= perf['slow_query_ms']:
+        slow_query_logger.warning('%.1f ms %s %s: %s %r', elapsed_ms, request.method, request.path,
+                                  statement, parameters)
+
+
+def _start_request():
+    g.perf = {
+        'started': time.perf_counter(),
+        'queries': 0,
+        'db_ms': 0.0,
+        'statements': Counter(),
+        'serialize_ms': 0.0,
+        'slow_query_ms': current_app.config['SLOW_QUERY_MS'],
+    }
+
+
+def _finish_request(response):
+    perf = g.pop('perf', None)
+    if perf is None:
+        return response
+    total_ms = (time.perf_counter() - perf['started']) * 1000
+    serialize_ms = perf['serialize_ms']
+    app_ms = max(total_ms - perf['db_ms'] - serialize_ms, 0.0)
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+
+    threshold = current_app.config['N_PLUS_ONE_THRESHOLD']
+    for statement, count in perf['statements'].items():
+        if count > threshold:
+            n_plus_one_logger.warning('Possible N+1 in %s %s: statement ran %d times: %s',
+                                      request.method, endpoint, count, statement)
+
+    current_app.extensions['metrics_registry'].record(endpoint, {
+        'total_ms': total_ms,
+        'db_ms': perf['db_ms'],
+        'serialize_ms': serialize_ms,
+        'queries': perf['queries'],
+    })
+    response.headers['Server-Timing'] = (
+        f'db;dur={perf["db_ms"]:.2f};desc="{perf["queries"]} queries", '
+        f'serialize;dur={serialize_ms:.2f}, app;dur={app_ms:.2f}, total;dur={total_ms:.2f}'
+    )
+    return response
+
+
+class TimedJSONProvider(FastJSONProvider):
+    """JSON provider that adds the time spent encoding response bodies to the request's record."""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            if has_request_context() and 'perf' in g:
+                g.perf['serialize_ms'] += (time.perf_counter() - started) * 1000
+
+
+def init_instrumentation(app, engine):
+    """Creates the app's metrics registry and registers the hooks if instrumentation is enabled."""
+    app.extensions['metrics_registry'] = MetricsRegistry()
+    app.config.setdefault('PERF_INSTRUMENTATION', os.environ.get('PERF_INSTRUMENTATION') == '1')
+    app.config.setdefault('SLOW_QUERY_MS', float(os.environ.get('SLOW_QUERY_MS', 100)))
+    app.config.setdefault('N_PLUS_ONE_THRESHOLD', int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10)))
+    if not app.config['PERF_INSTRUMENTATION']:
+        return
+
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.json = TimedJSONProvider(app)
+    app.register_blueprint(metrics_bp)
@@ -0,0 +1,340 @@
+"""Background jobs for work too heavy for a request (imports, stats rebuilds, exports).
+
+A request enqueues a job and returns 202 with the job's status URL. Jobs are
+stored in a small SQLite file (JOBS_DB_PATH) that every process on the host
+shares. `flask worker` claims queued jobs and runs them one at a time; start
+several workers to run jobs in parallel. CPU-bound steps, such as parsing an
+import file, run in the worker's process pool (JOB_WORKER_PROCESSES). Handlers
+report progress through JobContext.progress(). While a job runs, the worker
+also refreshes its heartbeat from a background thread, so a long step without
+progress reports isn't mistaken for a dead worker. A running job that sends no
+heartbeat for JOB_STALE_SECONDS is treated as orphaned by a crashed worker and
+is queued again, up to MAX_ATTEMPTS times. The jobs file is created on first
+use, not when the app is built.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, jsonify, url_for
+
+from backend.bulk_import import parse_records, import_books
+from backend.stats_rollup import rebuild_rollup
+from backend.cache import invalidate_user_stats
+from backend.export import export_row_count, write_export
+
+logger = logging.getLogger('backend.jobs')
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = 'queued', 'running', 'succeeded', 'failed'
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT,
+    result TEXT,
+    error TEXT,
+    progress_done INTEGER NOT NULL DEFAULT 0,
+    progress_total INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    heartbeat REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS ix_job_status_id ON job (status, id);
+CREATE INDEX IF NOT EXISTS ix_job_user_id ON job (user_id, id);
+"""
+
+# Job type -> handler(context, user_id, **payload); the handler's return value is stored as the result
+handlers = {}
+
+
+def job_handler(job_type):
+    def register(handler):
+        handlers[job_type] = handler
+        return handler
+    return register
+
+
+class JobQueue:
+    """Jobs table in a local SQLite file; safe to use from several threads and processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def after_fork(self):
+        # SQLite connections must not be shared with the parent process
+        self.local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            # Opened on first use, so building an app (every CLI run) doesn't create the file
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(SCHEMA)
+            self.local.connection = connection
+        return connection
+
+    def enqueue(self, job_type, user_id, payload):
+        with self._connection() as connection:
+            cursor = connection.execute(
+                'INSERT INTO job (type, user_id, status, payload, created) VALUES (?, ?, ?, ?, ?)',
+                (job_type, user_id, QUEUED, json.dumps(payload), time.time())
+            )
+        return cursor.lastrowid
+
+    def get(self, job_id, user_id=None):
+        query = 'SELECT * FROM job WHERE id = ?'
+        params = [job_id]
+        if user_id is not None:
+            query += ' AND user_id = ?'
+            params.append(user_id)
+        return self._connection().execute(query, params).fetchone()
+
+    def list_for_user(self, user_id, limit):
+        return self._connection().execute(
+            'SELECT * FROM job WHERE user_id = ? ORDER BY id DESC LIMIT ?', (user_id, limit)
+        ).fetchall()
+
+    def requeue_stale(self, stale_seconds):
+        """Requeues running jobs whose worker stopped sending heartbeats (or fails them after MAX_ATTEMPTS)."""
+        cutoff = time.time() - stale_seconds
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE job SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = CASE WHEN attempts >= ? THEN 'worker stopped responding' ELSE error END, "
+                "finished = CASE WHEN attempts >= ? THEN ? ELSE finished END, worker = NULL "
+                "WHERE status = ? AND heartbeat < ?",
+                (MAX_ATTEMPTS, FAILED, QUEUED, MAX_ATTEMPTS, MAX_ATTEMPTS, time.time(), RUNNING, cutoff)
+            )
+
+    def claim(self, worker):
+        """Atomically marks the oldest queued job as running and returns it, or None."""
+        now = time.time()
+        with self._connection() as connection:
+            # A single UPDATE ... RETURNING, so two workers can never claim the same job
+            return connection.execute(
+                'UPDATE job SET status = ?, worker = ?, attempts = attempts + 1, '
+                'started = ?, heartbeat = ? '
+                'WHERE id = (SELECT id FROM job WHERE status = ? ORDER BY id LIMIT 1) '
+                'RETURNING *',
+                (RUNNING, worker, now, now, QUEUED)
+            ).fetchone()
+
+    def progress(self, job_id, done, total=None):
+        with self._connection() as connection:
+            connection.execute(
+                'UPDATE job SET progress_done = ?, progress_total = COALESCE(?, progress_total), '
+                'heartbeat = ? WHERE id = ?',
+                (done, total, time.time(), job_id)
+            )
+
+    def heartbeat(self, job_id):
+        with self._connection() as connection:
+            connection.execute('UPDATE job SET heartbeat = ? WHERE id = ? AND status = ?',
+                               (time.time(), job_id, RUNNING))
+
+    def finish(self, job_id, result):
+        # The payload (e.g. a whole import file) is no longer needed once the job is done
+        with self._connection() as connection:
+            connection.execute(
+                'UPDATE job SET status = ?, result = ?, payload = NULL, finished = ? WHERE id = ?',
+                (SUCCEEDED, json.dumps(result), time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self._connection() as connection:
+            connection.execute(
+                'UPDATE job SET status = ?, error = ?, payload = NULL, finished = ? WHERE id = ?',
+                (FAILED, error, time.time(), job_id)
+            )
+
+
+class JobContext:
+    """What a handler gets besides its payload: the job, progress reporting and the process pool."""
+
+    def __init__(self, queue, job, pool):
+        self.queue = queue
+        self.job = job
+        self.pool = pool
+
+    def progress(self, done, total=None):
+        self.queue.progress(self.job['id'], done, total)
+
+    def run_cpu(self, fn, *args):
+        """Runs a picklable function in the process pool (inline if the worker has none)."""
+        if self.pool is None:
+            return fn(*args)
+        return self.pool.submit(fn, *args).result()
+
+
+class Heartbeat:
+    """Refreshes a running job's heartbeat every `interval` seconds from a background thread.
+
+    Without it, a handler that reports no progress for JOB_STALE_SECONDS would be
+    requeued and run a second time while it is still running. If the worker process
+    dies, the thread dies with it, so orphaned jobs are still requeued.
+    """
+
+    def __init__(self, queue, job_id, interval):
+        self.queue = queue
+        self.job_id = job_id
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'job-{job_id}-heartbeat', daemon=True)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.queue.heartbeat(self.job_id)
+            except sqlite3.Error:
+                logger.exception('Heartbeat for job %s failed', self.job_id)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+def init_jobs(app):
+    """Reads the job settings and sets up the app's job queue (the file is opened on first use)."""
+    app.config.setdefault('JOBS_DB_PATH', os.environ.get(
+        'JOBS_DB_PATH', os.path.join(app.instance_path, 'jobs.db')))
+    app.config.setdefault('JOB_WORKER_PROCESSES', int(os.environ.get('JOB_WORKER_PROCESSES', 2)))
+    app.config.setdefault('JOB_POLL_INTERVAL', float(os.environ.get('JOB_POLL_INTERVAL', 1.0)))
+    app.config.setdefault('JOB_STALE_SECONDS', int(os.environ.get('JOB_STALE_SECONDS', 600)))
+    app.config.setdefault('JOB_EXPORT_PATH', os.environ.get(
+        'JOB_EXPORT_PATH', os.path.join(app.instance_path, 'exports')))
+    app.extensions['job_queue'] = JobQueue(app.config['JOBS_DB_PATH'])
+
+
+def get_job_queue():
+    return current_app.extensions['job_queue']
+
+
+def serialize_job(job):
+    def timestamp(value):
+        return datetime.utcfromtimestamp(value).isoformat() + 'Z' if value else None
+
+    return {
+        'id': job['id'],
+        'type': job['type'],
+        'status': job['status'],
+        'progress': {'done': job['progress_done'], 'total': job['progress_total']},
+        'result': json.loads(job['result']) if job['result'] else None,
+        'error': job['error'],
+        'created_at': timestamp(job['created']),
+        'started_at': timestamp(job['started']),
+        'finished_at': timestamp(job['finished']),
+    }
+
+
+def enqueue_job(job_type, user_id, **payload):
+    """Queues a job and returns the 202 Accepted response pointing at its status URL."""
+    if job_type not in handlers:
+        raise ValueError(f'Unknown job type {job_type!r}')
+    job_queue = get_job_queue()
+    job_id = job_queue.enqueue(job_type, user_id, payload)
+    response = jsonify(serialize_job(job_queue.get(job_id)))
+    response.status_code = 202
+    response.headers['Location'] = url_for('job_bp.get_job', job_id=job_id)
+    return response
+
+
+def run_job(app, queue, job, pool):
+    """Runs one claimed job, keeping its heartbeat fresh, and records its result or error."""
+    handler = handlers.get(job['type'])
+    # Several beats per stale period, so one slow write can't get the job requeued
+    interval = max(app.config['JOB_STALE_SECONDS'] / 4, 1)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job type {job['type']!r}")
+        payload = json.loads(job['payload'] or '{}')
+        with Heartbeat(queue, job['id'], interval), app.app_context():
+            result = handler(JobContext(queue, job, pool), job['user_id'], **payload)
+        queue.finish(job['id'], result)
+        return True
+    except Exception as e:
+        logger.exception('Job %s (%s) failed', job['id'], job['type'])
+        queue.fail(job['id'], str(e))
+        return False
+
+
+def run_worker(app, processes, poll_interval, burst=False):
+    """Claims and runs jobs until interrupted (or, with burst, until the queue is empty).
+
+    Returns the number of jobs that were run.
+    """
+    # Only the worker needs a process pool, so web processes don't import it
+    from concurrent.futures import ProcessPoolExecutor
+
+    job_queue = app.extensions['job_queue']
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    pool = ProcessPoolExecutor(processes) if processes > 0 else None
+    count = 0
+    try:
+        while True:
+            job_queue.requeue_stale(app.config['JOB_STALE_SECONDS'])
+            job = job_queue.claim(worker)
+            if job is None:
+                if burst:
+                    return count
+                time.sleep(poll_interval)
+                continue
+            logger.info('Running job %s (%s) for user %s', job['id'], job['type'], job['user_id'])
+            run_job(app, job_queue, job, pool)
+            count += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+@job_handler('import_books')
+def run_import_books(context, user_id, text, fmt):
+    # Parsing a large CSV/JSON file is pure CPU, so it runs in the process pool
+    records = context.run_cpu(parse_records, text, fmt)
+    if not isinstance(records, list):
+        raise ValueError('Expected a list of books')
+    context.progress(0, len(records))
+    report = import_books(user_id, records, progress=context.progress)
+    if report['imported']:
+        invalidate_user_stats(user_id)
+    return report
+
+
+@job_handler('rebuild_stats')
+def run_rebuild_stats(context, user_id):
+    mismatched = rebuild_rollup(user_id)
+    invalidate_user_stats(user_id)
+    return {'corrected_months': len(mismatched)}
+
+
+def export_path(job_id, fmt):
+    return os.path.join(current_app.config['JOB_EXPORT_PATH'], f'{job_id}.{fmt}.gz')
+
+
+@job_handler('export_books')
+def run_export_books(context, user_id, fmt):
+    context.progress(0, export_row_count(user_id))
+    path = export_path(context.job['id'], fmt)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        rows = write_export(user_id, fmt, f, compress=True, progress=context.progress)
+    return {'rows': rows, 'format': fmt}
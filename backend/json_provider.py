@@ -0,0 +1,23 @@
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional; when it is installed, response bodies are encoded with it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that uses orjson for encoding when available.
+
+    Output matches the default provider for compact responses (sorted keys, no
+    whitespace), except that non-ASCII text is written as UTF-8 instead of escaped.
+    Indented output (debug mode) and any other custom options use the stdlib encoder.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent') or set(kwargs) - {'separators'}:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(
+            obj, default=self.default, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        ).decode('utf-8')
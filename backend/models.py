@@ -2,8 +2,8 @@ from sqlalchemy import Column, Integer, String, Text, ForeignKey, Date, UniqueCo
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func # For default date
 
-# Import the db instance from app.py
-from backend.app import db
+# Import the db instance from backend/extensions.py
+from backend.extensions import db
 
 class User(db.Model):
     __tablename__ = 'user'
@@ -55,10 +55,73 @@ class ReadingStatus(db.Model):
     user = db.relationship("User", back_populates="reading_statuses")
     book = db.relationship("Book", back_populates="reading_statuses")
 
-    __table_args__ = (db.UniqueConstraint('user_id', 'book_id', name='uq_user_book_status'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'book_id', name='uq_user_book_status'),
+        # Stats queries filter on user, status and finish_date
+        db.Index('ix_reading_status_user_status_finish', 'user_id', 'status', 'finish_date'),
+        # List queries filter on user and status and page by id; SQLite keeps the rowid (id)
+        # at the end of every index, so this one also serves the keyset ORDER BY id
+        db.Index('ix_reading_status_user_status', 'user_id', 'status'),
+    )
 
     def __repr__(self):
         return f'<ReadingStatus {self.user_id}-{self.book_id}: {self.status}>'
 
+class ApiToken(db.Model):
+    """API token for a user. Only the SHA-256 of the token is stored."""
+    __tablename__ = 'api_token'
+
+    id = db.Column(db.Integer, primary_key=True)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    created_date = db.Column(db.Date, nullable=False, default=func.current_date())
+
+    def __repr__(self):
+        return f'<ApiToken user={self.user_id}>'
+
+class BookCover(db.Model):
+    """Locally cached cover for a book, stored by content hash under the cover store."""
+    __tablename__ = 'book_cover'
+
+    book_id = db.Column(db.Integer, db.ForeignKey('book.id'), primary_key=True)
+    source_url = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    fetched_date = db.Column(db.Date, nullable=False, default=func.current_date())
+
+    def __repr__(self):
+        return f'<BookCover {self.book_id}: {self.content_hash[:12]}>'
+
+class UserDataVersion(db.Model):
+    """Per-user counter bumped by every write, used to build ETags for conditional GETs."""
+    __tablename__ = 'user_data_version'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<UserDataVersion {self.user_id}: {self.version}>'
+
+class MonthlyReadingStats(db.Model):
+    """Per-user, per-month rollup of finished books, kept in step with ReadingStatus.
+
+    Books marked 'read' without a finish_date are kept in an undated bucket
+    (year=0, month=0) so the summary totals still include them.
+    """
+    __tablename__ = 'monthly_reading_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    books_read = db.Column(db.Integer, nullable=False, default=0)
+    pages_read = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'year', 'month', name='uq_user_year_month'),)
+
+    def __repr__(self):
+        return f'<MonthlyReadingStats {self.user_id} {self.year}-{self.month:02d}: {self.books_read}>'
+
 # Now that models inherit from db.Model, db.create_all() in app.py will correctly
 # find and create these tables.
@@ -0,0 +1,104 @@
+from types import SimpleNamespace
+
+from sqlalchemy import case, update
+
+from backend.extensions import db
+from backend.models import Book, ReadingStatus
+from backend.bulk_import import VALID_STATUSES
+from backend.stats_rollup import status_contribution, replace_contribution
+from backend.conditional import bump_data_version
+
+# Largest batch accepted in one request
+MAX_PROGRESS_ITEMS = 1000
+
+
+def is_int(value):
+    # bool is a subclass of int, but `true` is not a page number
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def clean_progress_item(item):
+    """Validates one {book_id, current_page, status} item; raises ValueError with a readable message."""
+    if not isinstance(item, dict) or not is_int(item.get('book_id')):
+        raise ValueError('book_id must be an integer')
+    changes = {}
+    if item.get('current_page') is not None:
+        if not is_int(item['current_page']) or item['current_page'] < 0:
+            raise ValueError('current_page must be a non-negative integer')
+        changes['current_page'] = item['current_page']
+    if item.get('status') is not None:
+        if item['status'] not in VALID_STATUSES:
+            raise ValueError(f"invalid status {item['status']!r}")
+        changes['status'] = item['status']
+    if not changes:
+        raise ValueError('nothing to update (current_page or status)')
+    return item['book_id'], changes
+
+
+def apply_progress_updates(user_id, items):
+    """Applies many progress updates with one SELECT and one UPDATE ... CASE in a single transaction.
+
+    Repeated items for the same book are coalesced (the last one wins).
+    Returns (results, stats_changed), where results holds one compact
+    {'book_id', 'result'} entry per input item in input order.
+    """
+    results = [None] * len(items)
+    changes_by_book = {}
+    positions = {}
+    for i, item in enumerate(items):
+        try:
+            book_id, changes = clean_progress_item(item)
+        except ValueError as e:
+            results[i] = {'book_id': item.get('book_id') if isinstance(item, dict) else None,
+                          'result': 'invalid', 'message': str(e)}
+            continue
+        changes_by_book.setdefault(book_id, {}).update(changes)
+        positions.setdefault(book_id, []).append(i)
+
+    existing = {}
+    if changes_by_book:
+        rows = db.session.query(
+            ReadingStatus.book_id, ReadingStatus.status, ReadingStatus.rating,
+            ReadingStatus.finish_date, Book.page_count
+        ).join(Book, ReadingStatus.book_id == Book.id).filter(
+            ReadingStatus.user_id == user_id,
+            ReadingStatus.book_id.in_(changes_by_book)
+        ).all()
+        existing = {row.book_id: row for row in rows}
+
+    for book_id, indexes in positions.items():
+        for i in indexes:
+            results[i] = {'book_id': book_id, 'result': 'updated' if book_id in existing else 'not_found'}
+
+    found = {book_id: changes for book_id, changes in changes_by_book.items() if book_id in existing}
+    if not found:
+        return results, False
+
+    values = {}
+    for field in ('current_page', 'status'):
+        whens = {book_id: changes[field] for book_id, changes in found.items() if field in changes}
+        if whens:
+            values[field] = case(whens, value=ReadingStatus.book_id, else_=getattr(ReadingStatus, field))
+
+    stats_changed = False
+    try:
+        db.session.execute(
+            update(ReadingStatus).where(
+                ReadingStatus.user_id == user_id,
+                ReadingStatus.book_id.in_(found)
+            ).values(**values).execution_options(synchronize_session=False)
+        )
+        # Only status changes can move the monthly stats rollup
+        for book_id, changes in found.items():
+            row = existing[book_id]
+            if 'status' in changes and changes['status'] != row.status:
+                old = status_contribution(row, row.page_count)
+                new = status_contribution(SimpleNamespace(status=changes['status'], rating=row.rating,
+                                                          finish_date=row.finish_date), row.page_count)
+                stats_changed = replace_contribution(user_id, old, new) or stats_changed
+        bump_data_version(user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return results, stats_changed
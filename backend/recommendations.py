@@ -0,0 +1,336 @@
+"""Precomputed "similar books" index behind /api/books/<id>/similar and /api/recommendations.
+
+`flask build-recs` scores pairs of books offline. Two books score higher the more
+readers they share, as co-occurrence in reading_status normalised to cosine
+similarity. They also get a bonus for the same author or genre. The best
+RECS_TOP_K pairs per book go into a fixed-width binary table (RECS_INDEX_PATH),
+one slot of K (book_id, score) pairs per book id. Requests memory-map the file
+and read one slot, so a lookup is O(K) and never joins reading_status.
+
+After the slots the file keeps a fingerprint of each book's author and genre.
+`flask build-recs --incremental` recomputes only the slots touched since the last
+build: books with new reading statuses and their readers' other books, plus
+books that were added, deleted or got a new author or genre, together with the
+rows that list them or now get their author/genre bonus. Deleted statuses, and
+new statuses shifting which books make the MAX_BOOKS_PER_USER or
+MAX_FEATURE_CANDIDATES cuts, are picked up by the next full build.
+"""
+import heapq
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from collections import Counter, defaultdict
+
+from flask import current_app
+from sqlalchemy import select
+
+from backend.extensions import db
+from backend.models import Book, ReadingStatus
+
+HEADER = struct.Struct('<4sIIQ4x')  # magic, top_k, slots (max book id + 1), last reading_status id
+ENTRY = struct.Struct('<if')         # book_id, score; book_id 0 marks an empty entry
+FINGERPRINT = struct.Struct('<I')    # per slot after the entries: crc of author and genre, 0 for no book
+MAGIC = b'REC1'
+
+# Feature bonuses added to the co-readership cosine (which lies in 0..1)
+AUTHOR_WEIGHT = 0.3
+GENRE_WEIGHT = 0.1
+# Caps that keep the build roughly linear in the number of statuses
+MAX_BOOKS_PER_USER = 200      # only a user's most recent books count towards co-occurrence
+MAX_FEATURE_CANDIDATES = 100  # most-read books considered per author / genre
+
+# Seeds and weights for per-user recommendations
+SEED_BOOKS = 20
+SEED_STATUSES = ('read', 'currently_reading')
+
+
+class RecsIndex:
+    """Read side of the index: maps the file and re-maps it when a rebuild replaces it."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.map = None
+        self.top_k = 0
+        self.slots = 0
+
+    def _current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            if mtime != self.mtime:
+                with open(self.path, 'rb') as f:
+                    # The old map stays valid for readers still holding it; the rebuild replaced
+                    # the file instead of writing into it
+                    self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, self.top_k, self.slots, _ = HEADER.unpack_from(self.map)
+                if magic != MAGIC:
+                    raise ValueError(f'{self.path} is not a recommendations index')
+                self.mtime = mtime
+            return self.map, self.top_k, self.slots
+
+    def available(self):
+        return self._current() is not None
+
+    def similar(self, book_id, limit=None):
+        """Returns [(book_id, score), ...] best first, or None if the index hasn't been built."""
+        current = self._current()
+        if current is None:
+            return None
+        index_map, top_k, slots = current
+        if not 0 < book_id < slots:
+            return []
+        count = min(limit or top_k, top_k)
+        offset = HEADER.size + book_id * top_k * ENTRY.size
+        pairs = []
+        for other_id, score in ENTRY.iter_unpack(index_map[offset:offset + count * ENTRY.size]):
+            if not other_id:
+                break
+            pairs.append((other_id, score))
+        return pairs
+
+
+def read_header(path):
+    """(top_k, slots, last_status_id) of an existing index file, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        magic, top_k, slots, last_status_id = HEADER.unpack(f.read(HEADER.size))
+    return (top_k, slots, last_status_id) if magic == MAGIC else None
+
+
+def feature_fingerprint(author, genre):
+    return zlib.crc32(f'{author or ""}\0{genre or ""}'.encode()) or 1
+
+
+def read_fingerprints(path, top_k, slots):
+    """The per-slot fingerprints stored after the entries, and the header plus entries as a bytearray."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    size = HEADER.size + slots * top_k * ENTRY.size
+    fingerprints = [value for (value,) in FINGERPRINT.iter_unpack(data[size:size + slots * FINGERPRINT.size])]
+    return bytearray(data[:size]), fingerprints
+
+
+class SimilarityModel:
+    """Everything a row computation needs, loaded with two streaming queries."""
+
+    def __init__(self):
+        self.books_by_user = defaultdict(list)
+        self.users_by_book = defaultdict(list)
+        self.last_status_id = 0
+        statuses = db.session.execute(
+            select(ReadingStatus.id, ReadingStatus.user_id, ReadingStatus.book_id).order_by(
+                ReadingStatus.user_id, ReadingStatus.id.desc()
+            ).execution_options(yield_per=10000)
+        )
+        for status_id, user_id, book_id in statuses:
+            self.last_status_id = max(self.last_status_id, status_id)
+            books = self.books_by_user[user_id]
+            if len(books) < MAX_BOOKS_PER_USER:
+                books.append(book_id)
+                self.users_by_book[book_id].append(user_id)
+
+        self.meta = {}
+        # Every book per author / genre; the capped candidate lists below are what rows use
+        self.author_books = defaultdict(list)
+        self.genre_books = defaultdict(list)
+        for book_id, author, genre in db.session.execute(select(Book.id, Book.author, Book.genre)):
+            self.meta[book_id] = (author, genre)
+            if author:
+                self.author_books[author].append(book_id)
+            if genre:
+                self.genre_books[genre].append(book_id)
+        self.max_book_id = max(self.meta, default=0)
+
+        def most_read(book_ids):
+            return heapq.nlargest(MAX_FEATURE_CANDIDATES, book_ids,
+                                  key=lambda b: len(self.users_by_book.get(b, ())))
+        self.by_author = {author: most_read(ids) for author, ids in self.author_books.items()}
+        self.by_genre = {genre: most_read(ids) for genre, ids in self.genre_books.items()}
+
+    def fingerprints(self, slots):
+        fingerprints = [0] * slots
+        for book_id, (author, genre) in self.meta.items():
+            fingerprints[book_id] = feature_fingerprint(author, genre)
+        return fingerprints
+
+    def bonus_receivers(self, book_id):
+        """Books whose rows get an author or genre bonus from book_id."""
+        author, genre = self.meta.get(book_id, (None, None))
+        receivers = []
+        if book_id in self.by_author.get(author, ()):
+            receivers += self.author_books[author]
+        if book_id in self.by_genre.get(genre, ()):
+            receivers += self.genre_books[genre]
+        return receivers
+
+    def row(self, book_id, top_k):
+        """The top_k most similar books to book_id as [(book_id, score), ...]."""
+        readers = self.users_by_book.get(book_id, ())
+        counts = Counter()
+        for user_id in readers:
+            counts.update(self.books_by_user[user_id])
+        counts.pop(book_id, None)
+
+        scores = {
+            other_id: shared / math.sqrt(len(readers) * len(self.users_by_book[other_id]))
+            for other_id, shared in counts.items()
+        }
+        author, genre = self.meta.get(book_id, (None, None))
+        for group, weight in ((self.by_author.get(author, ()), AUTHOR_WEIGHT),
+                              (self.by_genre.get(genre, ()), GENRE_WEIGHT)):
+            for other_id in group:
+                if other_id != book_id:
+                    scores[other_id] = scores.get(other_id, 0.0) + weight
+        # Ties go to the lower book id so rebuilds are deterministic
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+
+def write_index(path, table, top_k, last_status_id, fingerprints):
+    """Atomically replaces the index file with the rows in `table` (a bytearray of slots)."""
+    HEADER.pack_into(table, 0, MAGIC, top_k, len(fingerprints), last_status_id)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(table)
+        f.write(struct.pack(f'<{len(fingerprints)}I', *fingerprints))
+    os.replace(tmp_path, path)
+
+
+def fill_slot(table, book_id, top_k, pairs):
+    offset = HEADER.size + book_id * top_k * ENTRY.size
+    table[offset:offset + top_k * ENTRY.size] = bytes(top_k * ENTRY.size)
+    for i, (other_id, score) in enumerate(pairs):
+        ENTRY.pack_into(table, offset + i * ENTRY.size, other_id, score)
+
+
+def slot_ids(table, book_id, top_k):
+    offset = HEADER.size + book_id * top_k * ENTRY.size
+    return [other_id for other_id, _ in ENTRY.iter_unpack(table[offset:offset + top_k * ENTRY.size])]
+
+
+def build_index(path, top_k, incremental=False):
+    """Builds (or incrementally refreshes) the index file; returns the number of slots computed."""
+    model = SimilarityModel()
+    slots = model.max_book_id + 1
+    fingerprints = model.fingerprints(slots)
+    header = read_header(path) if incremental else None
+    if header and header[0] == top_k:
+        _, old_slots, last_status_id = header
+        table, old_fingerprints = read_fingerprints(path, top_k, old_slots)
+        size = HEADER.size + slots * top_k * ENTRY.size
+        if len(table) < size:
+            table.extend(bytes(size - len(table)))
+        else:
+            del table[size:]
+        # A new (user, book) pair changes that book's row, the rows of the user's other books
+        # and (through the book's reader count) every row that lists it
+        changed = set()
+        rescored = set()
+        new_statuses = db.session.execute(
+            select(ReadingStatus.user_id, ReadingStatus.book_id).where(ReadingStatus.id > last_status_id)
+        )
+        for user_id, book_id in new_statuses:
+            rescored.add(book_id)
+            changed.update(model.books_by_user.get(user_id, ()))
+
+        # Added, deleted or re-labelled books change their own row, the rows that list them
+        # and the rows that now get their author / genre bonus
+        old_fingerprints += [0] * (max(slots, old_slots) - len(old_fingerprints))
+        moved = {book_id for book_id in range(max(slots, old_slots))
+                 if (fingerprints[book_id] if book_id < slots else 0) != old_fingerprints[book_id]}
+        for book_id in moved:
+            changed.update(model.bonus_receivers(book_id))
+
+        rescored |= moved
+        changed |= rescored
+        if rescored:
+            for book_id in range(min(slots, old_slots)):
+                if not rescored.isdisjoint(slot_ids(table, book_id, top_k)):
+                    changed.add(book_id)
+        changed = {book_id for book_id in changed if book_id < slots}
+    else:
+        table = bytearray(HEADER.size + slots * top_k * ENTRY.size)
+        changed = model.meta.keys()
+
+    for book_id in changed:
+        pairs = model.row(book_id, top_k) if book_id in model.meta else []
+        fill_slot(table, book_id, top_k, pairs)
+    write_index(path, table, top_k, model.last_status_id, fingerprints)
+    return len(changed)
+
+
+def fetch_scored_books(pairs, extra=None):
+    """Loads the books for [(book_id, score), ...] in one query, keeping the order.
+
+    extra maps book_id -> dict of additional fields for the response items.
+    """
+    ids = [book_id for book_id, _ in pairs]
+    rows = db.session.query(Book.id, Book.title, Book.author, Book.cover_image_url, Book.genre).filter(
+        Book.id.in_(ids)
+    ).all() if ids else []
+    books = {row.id: row for row in rows}
+    results = []
+    for book_id, score in pairs:
+        row = books.get(book_id)
+        if row is None:  # deleted since the last build
+            continue
+        item = {'id': row.id, 'title': row.title, 'author': row.author,
+                'cover_image_url': row.cover_image_url, 'genre': row.genre, 'score': round(score, 4)}
+        if extra:
+            item.update(extra.get(book_id, {}))
+        results.append(item)
+    return results
+
+
+def recommend_for_user(index, user_id, limit):
+    """Blends the top-K lists of the user's best-rated recent books; None without an index.
+
+    Cost is one bounded seed query, SEED_BOOKS slot reads and one query each to drop
+    owned books and load the winners.
+    """
+    if not index.available():
+        return None
+    seeds = db.session.query(ReadingStatus.book_id, ReadingStatus.rating).filter(
+        ReadingStatus.user_id == user_id, ReadingStatus.status.in_(SEED_STATUSES)
+    ).order_by(ReadingStatus.rating.desc().nullslast(), ReadingStatus.id.desc()).limit(SEED_BOOKS).all()
+
+    scores = Counter()
+    because = {}
+    for seed_id, rating in seeds:
+        similar = index.similar(seed_id) or []
+        # Books the user rated highly pull harder; unrated seeds count as a 3
+        weight = (rating or 3) / 5
+        for other_id, score in similar:
+            scores[other_id] += score * weight
+            if score * weight > because.get(other_id, (0, None))[0]:
+                because[other_id] = (score * weight, seed_id)
+
+    if scores:
+        owned = {book_id for (book_id,) in db.session.query(ReadingStatus.book_id).filter(
+            ReadingStatus.user_id == user_id, ReadingStatus.book_id.in_(list(scores))
+        )}
+        for book_id in owned:
+            del scores[book_id]
+    best = scores.most_common(limit)
+    return fetch_scored_books(best, {book_id: {'because_of': because[book_id][1]} for book_id, _ in best})
+
+
+def init_recommendations(app):
+    """Reads the index settings; the file itself is built with `flask build-recs`."""
+    app.config.setdefault('RECS_INDEX_PATH', os.environ.get(
+        'RECS_INDEX_PATH', os.path.join(app.instance_path, 'recs.bin')))
+    app.config.setdefault('RECS_TOP_K', int(os.environ.get('RECS_TOP_K', 20)))
+    app.extensions['recs_index'] = RecsIndex(app.config['RECS_INDEX_PATH'])
+
+
+def get_recs_index():
+    return current_app.extensions['recs_index']
@@ -1,12 +1,40 @@
-from flask import Blueprint, request, jsonify
-from backend.app import db
+from datetime import date
+
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from sqlalchemy import String, type_coerce
+from backend.extensions import db
 from backend.models import Book, ReadingStatus, User # Assuming User model might be needed later or for context
+from backend.stats_rollup import status_contribution, apply_contribution, replace_contribution
+from backend.conditional import conditional_get, bump_data_version
+from backend.auth import load_current_user, current_user_id
+from backend.bulk_import import parse_records, import_books, parse_optional_int, STATUS_INT_BOUNDS
+from backend.search import search_books
+from backend.cache import invalidate_user_stats
+from backend.progress import apply_progress_updates, MAX_PROGRESS_ITEMS
+from backend.covers import queue_cover_fetch
+from backend.jobs import enqueue_job
+from backend.export import EXPORT_FORMATS, EXPORT_MIMETYPES, iter_export, gzip_chunks
+import backend.recommendations as recommendations
 
 # Define the Blueprint
 book_bp = Blueprint('book_bp', __name__, url_prefix='/api/books')
 
-# Placeholder for a default user_id
-DEFAULT_USER_ID = 1
+# Resolve the calling user (API token or the default user) before every request
+book_bp.before_request(load_current_user)
+
+# Pagination settings for the book list
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_BATCH_SIZE = 500
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+# `order=` values for the book list. An ordered list is a single page (limit only, no cursor);
+# -finish_date is served from ix_reading_status_user_status_finish when filtered by status
+LIST_ORDERINGS = {
+    '-finish_date': (ReadingStatus.finish_date.desc().nullslast(), ReadingStatus.added_date.desc(),
+                     ReadingStatus.id.desc()),
+}
 
 # Helper function to serialize Book and ReadingStatus
 def serialize_book_with_status(book, reading_status):
@@ -36,8 +64,69 @@ def serialize_book_with_status(book, reading_status):
         }
     return book_data
 
+# Fields available to the columns-only list path and the `fields=` sparse fieldset
+BOOK_FIELDS = ('id', 'title', 'author', 'cover_image_url', 'publication_year', 'isbn',
+               'page_count', 'description', 'genre')
+STATUS_FIELDS = ('id', 'user_id', 'status', 'current_page', 'rating', 'start_date',
+                 'finish_date', 'added_date', 'notes')
+DATE_FIELDS = ('start_date', 'finish_date', 'added_date')
+
+def parse_fields(value):
+    """Parses `fields=title,author,reading_status.status` into (book_fields, status_fields).
+
+    `reading_status` alone selects every status field. Book id and status id are always
+    included. Returns every field when value is empty; raises ValueError on unknown names.
+    """
+    if not value:
+        return BOOK_FIELDS, STATUS_FIELDS
+    book_names, status_names = {'id'}, {'id'}
+    for name in value.split(','):
+        name = name.strip()
+        if name == 'reading_status':
+            status_names.update(STATUS_FIELDS)
+        elif name.startswith('reading_status.') and name[len('reading_status.'):] in STATUS_FIELDS:
+            status_names.add(name[len('reading_status.'):])
+        elif name in BOOK_FIELDS:
+            book_names.add(name)
+        else:
+            raise ValueError(f'Unknown field {name!r}')
+    return ([f for f in BOOK_FIELDS if f in book_names],
+            [f for f in STATUS_FIELDS if f in status_names])
+
+def build_row_serializer(book_fields, status_fields):
+    """Returns (columns, serialize) for selecting plain row tuples instead of ORM objects.
+
+    Dates are selected as their stored text, so SQLite rows skip date parsing and isoformat().
+    """
+    columns = [getattr(Book, f) for f in book_fields] + [
+        type_coerce(getattr(ReadingStatus, f), String) if f in DATE_FIELDS else getattr(ReadingStatus, f)
+        for f in status_fields
+    ]
+    split = len(book_fields)
+    date_positions = [i for i, f in enumerate(status_fields) if f in DATE_FIELDS]
+
+    def serialize(row):
+        book_data = dict(zip(book_fields, row[:split]))
+        status_values = list(row[split:])
+        for i in date_positions:
+            value = status_values[i]
+            # Other databases hand back date objects even through the String coercion
+            if value is not None and not isinstance(value, str):
+                status_values[i] = value.isoformat()
+        book_data['reading_status'] = dict(zip(status_fields, status_values))
+        return book_data
+
+    return columns, serialize
+
+def parse_date(value):
+    """Parses a YYYY-MM-DD string (or None) into a date; raises ValueError if malformed."""
+    if value is None or isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
 @book_bp.route('/', methods=['POST'])
 def add_book():
+    user_id = current_user_id()
     data = request.get_json()
 
     # Basic validation
@@ -77,51 +166,216 @@ def add_book():
             db.session.flush() # Get an ID for the new book
 
         # Now that book has an ID (either existing or newly flushed), handle ReadingStatus
-        reading_status = ReadingStatus.query.filter_by(user_id=DEFAULT_USER_ID, book_id=book.id).first()
+        reading_status = ReadingStatus.query.filter_by(user_id=user_id, book_id=book.id).first()
 
         if reading_status:
             # If reading status exists, update it (optional: or return conflict)
+            old_contribution = status_contribution(reading_status, book.page_count)
             reading_status.status = data.get('status', reading_status.status)
             # Update other fields if necessary
+            stats_changed = replace_contribution(
+                user_id, old_contribution, status_contribution(reading_status, book.page_count))
         else:
             reading_status = ReadingStatus(
-                user_id=DEFAULT_USER_ID,
+                user_id=user_id,
                 book_id=book.id,
                 status=data.get('status', 'want_to_read')
                 # Initialize other fields like current_page, rating, etc., if provided in `data`
             )
             db.session.add(reading_status)
+            stats_changed = apply_contribution(user_id, status_contribution(reading_status, book.page_count))
         
+        bump_data_version(user_id)
         db.session.commit()
+        # Only drop cached stats when the rollup actually moved
+        if stats_changed:
+            invalidate_user_stats(user_id)
+        if is_new_book:
+            # Download and thumbnail the cover in the background
+            queue_cover_fetch(book.id, book.cover_image_url)
         return jsonify(serialize_book_with_status(book, reading_status)), 201
 
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': 'Failed to add book or reading status', 'error': str(e)}), 500
 
+@book_bp.route('/bulk', methods=['POST'])
+def bulk_add_books():
+    """Imports many books at once from a JSON array, JSON lines or CSV (Goodreads export) body.
+
+    With ?async=1 the import is queued as a background job and the response is
+    202 with the job's status URL (see /api/jobs).
+    """
+    user_id = current_user_id()
+    if request.mimetype == 'application/json':
+        fmt = 'json'
+    elif request.mimetype == 'text/csv':
+        fmt = 'csv'
+    else:
+        fmt = 'jsonl'
+
+    if request.args.get('async') == '1':
+        text = request.get_data(as_text=True)
+        if not text.strip():
+            return jsonify({'message': 'No input data provided'}), 400
+        return enqueue_job('import_books', user_id, text=text, fmt=fmt)
+
+    try:
+        records = parse_records(request.get_data(as_text=True), fmt)
+    except (ValueError, AttributeError) as e:
+        return jsonify({'message': f'Could not parse {fmt} body', 'error': str(e)}), 400
+    if not isinstance(records, list):
+        return jsonify({'message': 'Expected a list of books'}), 400
+
+    try:
+        report = import_books(user_id, records)
+    except Exception as e:
+        return jsonify({'message': 'Failed to import books', 'error': str(e)}), 500
+    if report['imported']:
+        invalidate_user_stats(user_id)
+    return jsonify(report), 200
+
 @book_bp.route('/', methods=['GET'])
+@conditional_get
 def get_all_books():
+    user_id = current_user_id()
     status_filter = request.args.get('status')
-    
-    query = db.session.query(Book, ReadingStatus).join(
+    order = request.args.get('order')
+    try:
+        book_fields, status_fields = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    if order is not None and order not in LIST_ORDERINGS:
+        return jsonify({'message': f"order must be one of {', '.join(LIST_ORDERINGS)}"}), 400
+    if order is not None and request.args.get('cursor'):
+        return jsonify({'message': 'cursor cannot be combined with order'}), 400
+
+    # Select only the needed columns into row tuples; no ORM objects are built
+    columns, serialize = build_row_serializer(book_fields, status_fields)
+    status_id_position = len(book_fields)  # status 'id' is always the first status field
+
+    query = db.session.query(*columns).join(
         ReadingStatus, Book.id == ReadingStatus.book_id
-    ).filter(ReadingStatus.user_id == DEFAULT_USER_ID)
+    ).filter(ReadingStatus.user_id == user_id)
 
     if status_filter:
         query = query.filter(ReadingStatus.status == status_filter)
-    
+
+    if order is not None:
+        query = query.order_by(*LIST_ORDERINGS[order])
+    else:
+        # Keyset order: ReadingStatus.id is unique per row and backed by the primary key
+        query = query.order_by(ReadingStatus.id)
+
+    # Streaming mode: emit the JSON array incrementally so memory stays flat
+    if request.args.get('stream') in ('1', 'true'):
+        return Response(stream_with_context(stream_books_json(query, serialize)), mimetype='application/json'), 200
+
+    # Paginated mode: only when the client asks for it, so existing callers keep getting a plain list
+    if 'limit' in request.args or 'cursor' in request.args:
+        try:
+            limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+            cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+        except ValueError:
+            return jsonify({'message': 'limit and cursor must be integers'}), 400
+        if limit < 1:
+            return jsonify({'message': 'limit must be a positive integer'}), 400
+        limit = min(limit, MAX_PAGE_SIZE)
+
+        if cursor is not None:
+            query = query.filter(ReadingStatus.id > cursor)
+
+        # Fetch one extra row to know whether another page exists
+        results = query.limit(limit + 1).all()
+        has_more = len(results) > limit
+        results = results[:limit]
+
+        return jsonify({
+            'books': [serialize(row) for row in results],
+            'next_cursor': results[-1][status_id_position] if has_more and order is None else None
+        }), 200
+
     results = query.all()
     
-    books_with_status_list = []
-    for book, reading_status in results:
-        books_with_status_list.append(serialize_book_with_status(book, reading_status))
+    books_with_status_list = [serialize(row) for row in results]
         
     return jsonify(books_with_status_list), 200
 
+def stream_books_json(query, serialize):
+    """Yields a JSON array of books chunk by chunk, fetching rows in batches."""
+    dumps = current_app.json.dumps
+    yield '['
+    first = True
+    for row in query.yield_per(STREAM_BATCH_SIZE):
+        item = dumps(serialize(row))
+        yield item if first else ',' + item
+        first = False
+    yield ']'
+
+@book_bp.route('/export', methods=['GET'])
+def export_books():
+    """Streams the caller's library as JSON lines or CSV (?format=jsonl|csv).
+
+    Rows are encoded batch by batch from a server-side cursor and gzip-compressed on
+    the fly when the client accepts it, so memory stays flat for any library size.
+    """
+    user_id = current_user_id()
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    body = iter_export(user_id, fmt)
+    headers = {
+        'Content-Disposition': f'attachment; filename=books-{date.today():%Y%m%d}.{fmt}',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.accept_encodings['gzip']:
+        body = gzip_chunks(body)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream_with_context(body), mimetype=EXPORT_MIMETYPES[fmt], headers=headers), 200
+
+@book_bp.route('/export', methods=['POST'])
+def queue_export():
+    """Queues the export as a background job; download the gzip file from /api/jobs/<id>/download."""
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'message': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    return enqueue_job('export_books', current_user_id(), fmt=fmt)
+
+@book_bp.route('/search', methods=['GET'])
+def search():
+    """Full-text search over all books, ranked by relevance, with the caller's reading status."""
+    user_id = current_user_id()
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'message': 'Missing search query (q)'}), 400
+    try:
+        limit = int(request.args.get('limit', DEFAULT_SEARCH_PAGE_SIZE))
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({'message': 'limit and offset must be integers'}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({'message': 'limit must be positive and offset non-negative'}), 400
+    limit = min(limit, MAX_SEARCH_PAGE_SIZE)
+
+    # Fetch one extra result to know whether another page exists
+    results = search_books(user_id, q, limit + 1, offset)
+    if results is None:
+        return jsonify({'message': 'Search index not built; run flask build-search-index'}), 503
+    has_more = len(results) > limit
+    results = results[:limit]
+
+    return jsonify({
+        'books': [serialize_book_with_status(book, reading_status) for book, reading_status in results],
+        'next_offset': offset + limit if has_more else None
+    }), 200
+
 @book_bp.route('/<int:book_id>', methods=['GET'])
+@conditional_get
 def get_book(book_id):
+    user_id = current_user_id()
     result = db.session.query(Book, ReadingStatus).outerjoin(
-        ReadingStatus, (ReadingStatus.book_id == Book.id) & (ReadingStatus.user_id == DEFAULT_USER_ID)
+        ReadingStatus, (ReadingStatus.book_id == Book.id) & (ReadingStatus.user_id == user_id)
     ).filter(Book.id == book_id).first()
 
     if not result:
@@ -134,7 +388,7 @@ def get_book(book_id):
     # This is a bit ambiguous. If the book exists but has no reading status for the user,
     # is that a 404? Or just return the book with status: null?
     # Current implementation: if book is found, return it. Status can be null.
-    # Let's adjust to: if book is found, but no reading_status for DEFAULT_USER_ID,
+    # Let's adjust to: if book is found, but no reading_status for the current user,
     # it's not an error for the book itself, but the combined resource might be considered "not found"
     # for this specific user context.
     # However, typical GET /resource/{id} returns 404 only if resource {id} itself doesn't exist.
@@ -142,39 +396,91 @@ def get_book(book_id):
 
     return jsonify(serialize_book_with_status(book, reading_status)), 200
 
+@book_bp.route('/<int:book_id>/similar', methods=['GET'])
+def get_similar_books(book_id):
+    """Books similar to this one, read from the precomputed index (`flask build-recs`)."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+    if limit < 1:
+        return jsonify({'message': 'limit must be a positive integer'}), 400
+
+    pairs = recommendations.get_recs_index().similar(book_id, limit)
+    if pairs is None:
+        return jsonify({'message': 'Recommendations index not built; run flask build-recs'}), 503
+    if not pairs and not db.session.get(Book, book_id):
+        return jsonify({'message': 'Book not found'}), 404
+    return jsonify(recommendations.fetch_scored_books(pairs)), 200
+
+@book_bp.route('/progress', methods=['PATCH'])
+def update_progress():
+    """Applies a batch of {book_id, current_page, status} updates in one transaction."""
+    user_id = current_user_id()
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'message': 'Expected a non-empty list of progress updates'}), 400
+    if len(items) > MAX_PROGRESS_ITEMS:
+        return jsonify({'message': f'At most {MAX_PROGRESS_ITEMS} updates per request'}), 400
+
+    try:
+        results, stats_changed = apply_progress_updates(user_id, items)
+    except Exception as e:
+        return jsonify({'message': 'Failed to update reading progress', 'error': str(e)}), 500
+    if stats_changed:
+        invalidate_user_stats(user_id)
+    return jsonify({'results': results}), 200
+
 @book_bp.route('/<int:book_id>', methods=['PUT'])
 def update_book_status(book_id):
+    user_id = current_user_id()
     data = request.get_json()
     if not data:
         return jsonify({'message': 'No input data provided'}), 400
 
     reading_status = ReadingStatus.query.filter_by(
         book_id=book_id, 
-        user_id=DEFAULT_USER_ID
+        user_id=user_id
     ).first()
 
     if not reading_status:
         return jsonify({'message': 'Reading status not found for this book and user'}), 404
 
+    book = reading_status.book
+    old_contribution = status_contribution(reading_status, book.page_count)
+
     # Update fields if provided in the payload
     if 'status' in data:
         reading_status.status = data['status']
-    if 'current_page' in data:
-        reading_status.current_page = data['current_page']
-    if 'rating' in data:
-        reading_status.rating = data['rating']
-    if 'start_date' in data:
-        # Basic date validation could be added here
-        reading_status.start_date = data['start_date'] # Assuming YYYY-MM-DD string
-    if 'finish_date' in data:
-        reading_status.finish_date = data['finish_date'] # Assuming YYYY-MM-DD string
+    try:
+        # The stats rollup adds these up, so only integers get stored
+        if 'current_page' in data:
+            reading_status.current_page = parse_optional_int(data['current_page'], 'current_page', *STATUS_INT_BOUNDS['current_page'])
+        if 'rating' in data:
+            reading_status.rating = parse_optional_int(data['rating'], 'rating', *STATUS_INT_BOUNDS['rating'])
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    try:
+        if 'start_date' in data:
+            reading_status.start_date = parse_date(data['start_date'])
+        if 'finish_date' in data:
+            reading_status.finish_date = parse_date(data['finish_date'])
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({'message': 'Dates must be in YYYY-MM-DD format'}), 400
     if 'notes' in data:
         reading_status.notes = data['notes']
     
     try:
+        # Keep the monthly stats rollup in the same transaction as the status change
+        stats_changed = replace_contribution(
+            user_id, old_contribution, status_contribution(reading_status, book.page_count))
+        bump_data_version(user_id)
         db.session.commit()
-        # Fetch the associated book to return complete information
-        book = Book.query.get(book_id)
+        if stats_changed:
+            invalidate_user_stats(user_id)
         return jsonify(serialize_book_with_status(book, reading_status)), 200
     except Exception as e:
         db.session.rollback()
@@ -182,17 +488,23 @@ def update_book_status(book_id):
 
 @book_bp.route('/<int:book_id>', methods=['DELETE'])
 def delete_book_status(book_id):
+    user_id = current_user_id()
     reading_status = ReadingStatus.query.filter_by(
         book_id=book_id,
-        user_id=DEFAULT_USER_ID
+        user_id=user_id
     ).first()
 
     if not reading_status:
         return jsonify({'message': 'Reading status not found for this book and user'}), 404
 
     try:
+        stats_changed = apply_contribution(
+            user_id, status_contribution(reading_status, reading_status.book.page_count), -1)
         db.session.delete(reading_status)
+        bump_data_version(user_id)
         db.session.commit()
+        if stats_changed:
+            invalidate_user_stats(user_id)
         return jsonify({'message': 'Book reading status deleted successfully'}), 200 # Or 204 No Content
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,48 @@
+import os
+
+from flask import Blueprint, request, jsonify, send_file
+import backend.jobs as jobs
+from backend.auth import load_current_user, current_user_id
+
+# Define the Blueprint
+job_bp = Blueprint('job_bp', __name__, url_prefix='/api/jobs')
+
+# Resolve the calling user (API token or the default user) before every request
+job_bp.before_request(load_current_user)
+
+DEFAULT_JOB_LIST_SIZE = 20
+MAX_JOB_LIST_SIZE = 100
+
+@job_bp.route('/', methods=['GET'])
+def list_jobs():
+    """The calling user's most recent jobs, newest first."""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_JOB_LIST_SIZE))
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_JOB_LIST_SIZE))
+    rows = jobs.get_job_queue().list_for_user(current_user_id(), limit)
+    return jsonify([jobs.serialize_job(row) for row in rows]), 200
+
+@job_bp.route('/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status, progress and (once finished) the result or error of one job."""
+    job = jobs.get_job_queue().get(job_id, user_id=current_user_id())
+    if not job:
+        return jsonify({'message': 'Job not found'}), 404
+    return jsonify(jobs.serialize_job(job)), 200
+
+@job_bp.route('/<int:job_id>/download', methods=['GET'])
+def download_job_file(job_id):
+    """The gzip file written by a finished export job."""
+    job = jobs.get_job_queue().get(job_id, user_id=current_user_id())
+    if not job or job['type'] != 'export_books':
+        return jsonify({'message': 'Job not found'}), 404
+    if job['status'] != jobs.SUCCEEDED:
+        return jsonify({'message': f"Export is {job['status']}"}), 409
+    fmt = jobs.serialize_job(job)['result']['format']
+    path = jobs.export_path(job_id, fmt)
+    if not os.path.exists(path):
+        return jsonify({'message': 'Export file no longer exists'}), 410
+    return send_file(path, mimetype='application/gzip', as_attachment=True,
+                     download_name=f'books-{job_id}.{fmt}.gz')
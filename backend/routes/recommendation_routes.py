@@ -0,0 +1,26 @@
+from flask import Blueprint, request, jsonify
+import backend.recommendations as recommendations
+from backend.auth import load_current_user, current_user_id
+
+# Define the Blueprint
+recommendation_bp = Blueprint('recommendation_bp', __name__, url_prefix='/api/recommendations')
+
+# Resolve the calling user (API token or the default user) before every request
+recommendation_bp.before_request(load_current_user)
+
+DEFAULT_RECOMMENDATIONS = 10
+MAX_RECOMMENDATIONS = 50
+
+@recommendation_bp.route('', methods=['GET'])
+def get_recommendations():
+    """Books the caller doesn't have yet, ranked from the similar-books index of their best-rated reads."""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_RECOMMENDATIONS))
+    except ValueError:
+        return jsonify({'message': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_RECOMMENDATIONS))
+
+    books = recommendations.recommend_for_user(recommendations.get_recs_index(), current_user_id(), limit)
+    if books is None:
+        return jsonify({'message': 'Recommendations index not built; run flask build-recs'}), 503
+    return jsonify(books), 200
@@ -1,123 +1,128 @@
-from flask import Blueprint, jsonify
-from backend.app import db
-from backend.models import Book, ReadingStatus
-from sqlalchemy import func, extract
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta # For more complex date manipulations like months
+from functools import wraps
+
+from flask import Blueprint, request, jsonify, make_response
+from backend.models import MonthlyReadingStats
+import backend.cache as cache
+from backend.auth import load_current_user, current_user_id
+from backend.conditional import get_data_version
+from backend.jobs import enqueue_job
+from datetime import datetime, date
 
 # Define the Blueprint
 stats_bp = Blueprint('stats_bp', __name__, url_prefix='/api/stats')
 
-# Placeholder for a default user_id (as used in other routes)
-DEFAULT_USER_ID = 1
+# Resolve the calling user (API token or the default user) before every request
+stats_bp.before_request(load_current_user)
 
-@stats_bp.route('/summary', methods=['GET'])
-def get_reading_summary():
-    # Total books read
-    total_books_read = db.session.query(func.count(ReadingStatus.id)).filter_by(
-        user_id=DEFAULT_USER_ID, 
-        status='read'
-    ).scalar()
-
-    # Total pages read
-    # This requires joining ReadingStatus with Book to get page_count
-    total_pages_read = db.session.query(func.sum(Book.page_count)).join(
-        ReadingStatus, ReadingStatus.book_id == Book.id
-    ).filter(
-        ReadingStatus.user_id == DEFAULT_USER_ID,
-        ReadingStatus.status == 'read'
-    ).scalar() or 0 # Ensure 0 if None
-
-    # Average rating
-    average_rating = db.session.query(func.avg(ReadingStatus.rating)).filter(
-        ReadingStatus.user_id == DEFAULT_USER_ID,
-        ReadingStatus.status == 'read',
-        ReadingStatus.rating.isnot(None) # Only consider books that have a rating
-    ).scalar()
-    
-    # If average_rating is None (no rated books), set to 0 or null as preferred
-    if average_rating is None:
-        average_rating = 0.0 
-    else:
-        # Ensure it's a float, as some DBs might return Decimal
-        average_rating = float(average_rating)
+# Window sizes for the monthly series
+DEFAULT_MONTHS = 12
+MAX_MONTHS = 240
 
+# All endpoints read the monthly_reading_stats rollup (maintained by book_routes and
+# rebuilt with `flask rebuild-stats`), so each call touches O(months) rows, not O(books).
 
-    return jsonify({
+def cached_stats(view):
+    """Serves the response from the stats cache, keyed by the user's data version.
+
+    Every write bumps the version in its own commit, and the version is read before
+    the rollup, so a body computed from older data is only ever stored under a key
+    that no later request looks up.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user_id = current_user_id()
+        # The month windows depend on today's month, so it is part of the key
+        key = (f"{cache.user_stats_prefix(user_id)}{get_data_version(user_id)}:"
+               f"{datetime.utcnow():%Y-%m}:{request.full_path}")
+        stats_cache = cache.get_stats_cache()
+        body = stats_cache.get(key)
+        if body is not None:
+            response = make_response(body)
+            response.mimetype = 'application/json'
+            response.headers['X-Cache'] = 'HIT'
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            stats_cache.set(key, response.get_data())
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    return wrapper
+
+def month_window(months):
+    """Returns [(year, month, "Jan 2023"), ...] for the last `months` months, oldest first."""
+    today = datetime.utcnow()
+    # Count months as a single integer so stepping back is plain arithmetic
+    newest = today.year * 12 + today.month - 1
+    window = []
+    for index in range(newest - months + 1, newest + 1):
+        year, month_zero_based = divmod(index, 12)
+        label = date(year, month_zero_based + 1, 1).strftime("%b %Y")
+        window.append((year, month_zero_based + 1, label))
+    return window
+
+def get_rollup_rows():
+    """Fetches every rollup row for the user in one query: O(months of history)."""
+    return MonthlyReadingStats.query.filter_by(user_id=current_user_id()).all()
+
+def build_summary(rows):
+    # Totals across every month, including the undated bucket (year=0, month=0)
+    total_books_read = sum(r.books_read for r in rows)
+    total_pages_read = sum(r.pages_read for r in rows)
+    rating_sum = sum(r.rating_sum for r in rows)
+    rating_count = sum(r.rating_count for r in rows)
+
+    # Average rating, 0 if there are no rated books
+    average_rating = float(rating_sum) / rating_count if rating_count else 0.0
+
+    return {
         'total_books_read': total_books_read,
         'total_pages_read': total_pages_read,
         'average_rating': round(average_rating, 2) # Round to 2 decimal places
-    }), 200
+    }
+
+def build_monthly_series(rows, months, field, key):
+    rollup_by_month = {(r.year, r.month): r for r in rows}
+    results = []
+    for year, month, label in month_window(months):
+        row = rollup_by_month.get((year, month))
+        results.append({'month_year': label, key: getattr(row, field) if row else 0})
+    return results # Oldest to newest
+
+@stats_bp.route('/summary', methods=['GET'])
+@cached_stats
+def get_reading_summary():
+    return jsonify(build_summary(get_rollup_rows())), 200
 
 @stats_bp.route('/books_per_month', methods=['GET'])
+@cached_stats
 def get_books_per_month():
-    today = datetime.utcnow()
-    results = []
-    
-    # Query to get books read, grouped by year and month of finish_date
-    # This will give us counts only for months where books were finished.
-    db_results = db.session.query(
-        extract('year', ReadingStatus.finish_date).label('year'),
-        extract('month', ReadingStatus.finish_date).label('month'),
-        func.count(ReadingStatus.id).label('count')
-    ).filter(
-        ReadingStatus.user_id == DEFAULT_USER_ID,
-        ReadingStatus.status == 'read',
-        ReadingStatus.finish_date.isnot(None) # Ensure finish_date is set
-    ).group_by('year', 'month').order_by(extract('year', ReadingStatus.finish_date).desc(), extract('month', ReadingStatus.finish_date).desc()).all()
-
-    # Convert db_results to a dictionary for easier lookup: {(year, month): count}
-    books_by_month_map = {(int(r.year), int(r.month)): r.count for r in db_results}
-
-    for i in range(12):
-        # Calculate the month and year for the i-th month ago
-        # Using relativedelta for accurate month subtraction
-        target_date = today - relativedelta(months=i)
-        year = target_date.year
-        month = target_date.month
-        
-        # Format month_year string e.g., "Jan 2023"
-        month_year_str = target_date.strftime("%b %Y")
-        
-        count = books_by_month_map.get((year, month), 0)
-        results.append({'month_year': month_year_str, 'count': count})
-        
-    # The results are currently from newest to oldest. If oldest to newest is preferred:
-    results.reverse() 
-    
-    return jsonify(results), 200
+    return jsonify(build_monthly_series(get_rollup_rows(), DEFAULT_MONTHS, 'books_read', 'count')), 200
 
 @stats_bp.route('/pages_read_per_month', methods=['GET'])
+@cached_stats
 def get_pages_read_per_month():
-    today = datetime.utcnow()
-    results = []
+    return jsonify(build_monthly_series(get_rollup_rows(), DEFAULT_MONTHS, 'pages_read', 'total_pages')), 200
+
+@stats_bp.route('/overview', methods=['GET'])
+@cached_stats
+def get_overview():
+    """Summary plus both monthly series from a single query, for one-request dashboard renders."""
+    try:
+        months = int(request.args.get('months', DEFAULT_MONTHS))
+    except ValueError:
+        return jsonify({'message': 'months must be an integer'}), 400
+    if not 1 <= months <= MAX_MONTHS:
+        return jsonify({'message': f'months must be between 1 and {MAX_MONTHS}'}), 400
+
+    rows = get_rollup_rows()
+    return jsonify({
+        'summary': build_summary(rows),
+        'books_per_month': build_monthly_series(rows, months, 'books_read', 'count'),
+        'pages_read_per_month': build_monthly_series(rows, months, 'pages_read', 'total_pages')
+    }), 200
 
-    # Query to get sum of pages read, grouped by year and month of finish_date
-    db_results = db.session.query(
-        extract('year', ReadingStatus.finish_date).label('year'),
-        extract('month', ReadingStatus.finish_date).label('month'),
-        func.sum(Book.page_count).label('total_pages')
-    ).join(Book, ReadingStatus.book_id == Book.id).filter(
-        ReadingStatus.user_id == DEFAULT_USER_ID,
-        ReadingStatus.status == 'read',
-        ReadingStatus.finish_date.isnot(None),
-        Book.page_count.isnot(None) # Only include books with page count
-    ).group_by('year', 'month').order_by(extract('year', ReadingStatus.finish_date).desc(), extract('month', ReadingStatus.finish_date).desc()).all()
-
-    # Convert db_results to a dictionary for easier lookup: {(year, month): total_pages}
-    pages_by_month_map = {(int(r.year), int(r.month)): (r.total_pages or 0) for r in db_results}
-
-
-    for i in range(12):
-        target_date = today - relativedelta(months=i)
-        year = target_date.year
-        month = target_date.month
-        
-        month_year_str = target_date.strftime("%b %Y")
-        
-        total_pages = pages_by_month_map.get((year, month), 0)
-        results.append({'month_year': month_year_str, 'total_pages': total_pages})
-        
-    results.reverse() # Oldest to newest
-    
-    return jsonify(results), 200
+@stats_bp.route('/rebuild', methods=['POST'])
+def rebuild_stats():
+    """Queues a full recompute of the caller's stats rollup; poll the returned job for the result."""
+    return enqueue_job('rebuild_stats', current_user_id())
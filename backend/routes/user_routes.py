@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
-from backend.app import db
+from backend.extensions import db
 from backend.models import User
+from backend.conditional import conditional_get, bump_data_version
+from backend.auth import load_current_user, current_user_id
 
 # Define the Blueprint
 user_bp = Blueprint('user_bp', __name__, url_prefix='/api/profile')
 
-# Placeholder for a default user_id (as used in book_routes)
-DEFAULT_USER_ID = 1
+# Resolve the calling user (API token or the default user) before every request
+user_bp.before_request(load_current_user)
 
 # Helper function to serialize User data
 def serialize_user(user):
@@ -21,15 +23,18 @@ def serialize_user(user):
     }
 
 @user_bp.route('/', methods=['GET'])
+@conditional_get
 def get_user_profile():
-    user = User.query.get(DEFAULT_USER_ID)
+    user_id = current_user_id()
+    user = User.query.get(user_id)
     if not user:
         return jsonify({'message': 'User profile not found'}), 404
     return jsonify(serialize_user(user)), 200
 
 @user_bp.route('/', methods=['PUT'])
 def update_user_profile():
-    user = User.query.get(DEFAULT_USER_ID)
+    user_id = current_user_id()
+    user = User.query.get(user_id)
     if not user:
         return jsonify({'message': 'User profile not found'}), 404
 
@@ -51,6 +56,7 @@ def update_user_profile():
         user.location = data['location']
     
     try:
+        bump_data_version(user_id)
         db.session.commit()
         return jsonify(serialize_user(user)), 200
     except Exception as e:
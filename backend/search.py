@@ -0,0 +1,122 @@
+import re
+
+from sqlalchemy import event, text, or_
+from sqlalchemy.exc import OperationalError
+
+from backend.extensions import db
+from backend.models import Book, ReadingStatus
+
+# Column weights for bm25(): title, author, description, genre
+BM25_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+# External-content FTS5 index over book; the triggers keep it in step with every
+# write to book, including the Core bulk inserts used by the importer.
+FTS_DDL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5(
+        title, author, description, genre,
+        content='book', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS book_fts_ai AFTER INSERT ON book BEGIN
+        INSERT INTO book_fts(rowid, title, author, description, genre)
+        VALUES (new.id, new.title, new.author, new.description, new.genre);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS book_fts_ad AFTER DELETE ON book BEGIN
+        INSERT INTO book_fts(book_fts, rowid, title, author, description, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.description, old.genre);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS book_fts_au AFTER UPDATE ON book BEGIN
+        INSERT INTO book_fts(book_fts, rowid, title, author, description, genre)
+        VALUES ('delete', old.id, old.title, old.author, old.description, old.genre);
+        INSERT INTO book_fts(rowid, title, author, description, genre)
+        VALUES (new.id, new.title, new.author, new.description, new.genre);
+    END""",
+)
+
+
+def create_search_index(connection):
+    """Creates the FTS table and its triggers if missing (SQLite only)."""
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def rebuild_search_index(connection):
+    """Re-indexes every book from the book table."""
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.exec_driver_sql("INSERT INTO book_fts(book_fts) VALUES ('rebuild')")
+
+
+def ensure_search_index(connection):
+    """Creates and fills the index if the database doesn't have it yet; returns True if it did.
+
+    create_all() only builds it together with a new book table, so databases created
+    before full-text search existed need this (run by `flask create-db`).
+    """
+    if connection.dialect.name != 'sqlite':
+        return False
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'book_fts'"
+    ).first()
+    if exists:
+        return False
+    create_search_index(connection)
+    rebuild_search_index(connection)
+    return True
+
+
+@event.listens_for(Book.__table__, 'after_create')
+def _create_search_index_with_book_table(target, connection, **kw):
+    create_search_index(connection)
+
+
+def to_match_query(q):
+    """Turns free text into a safe FTS5 query: every word must match, as a prefix."""
+    terms = re.findall(r'\w+', q)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_book_ids(q, limit, offset):
+    """Returns the ids of matching books, best match first, or None if the index hasn't been built."""
+    if db.engine.dialect.name == 'sqlite':
+        match = to_match_query(q)
+        if not match:
+            return []
+        try:
+            rows = db.session.execute(
+                text(
+                    "SELECT rowid FROM book_fts WHERE book_fts MATCH :match "
+                    "ORDER BY bm25(book_fts, {}) LIMIT :limit OFFSET :offset".format(
+                        ', '.join(str(w) for w in BM25_WEIGHTS))
+                ),
+                {'match': match, 'limit': limit, 'offset': offset},
+            ).all()
+        except OperationalError as e:
+            if 'no such table: book_fts' not in str(e.orig):
+                raise
+            db.session.rollback()
+            return None
+        return [row[0] for row in rows]
+
+    # Other databases: plain substring match on title and author
+    pattern = f'%{q}%'
+    rows = db.session.query(Book.id).filter(
+        or_(Book.title.ilike(pattern), Book.author.ilike(pattern))
+    ).order_by(Book.title).limit(limit).offset(offset)
+    return [row[0] for row in rows]
+
+
+def search_books(user_id, q, limit, offset):
+    """Returns [(Book, ReadingStatus or None), ...] in rank order for one page of results.
+
+    None means the full-text index hasn't been built.
+    """
+    book_ids = search_book_ids(q, limit, offset)
+    if not book_ids:
+        return book_ids
+    results = db.session.query(Book, ReadingStatus).outerjoin(
+        ReadingStatus, (ReadingStatus.book_id == Book.id) & (ReadingStatus.user_id == user_id)
+    ).filter(Book.id.in_(book_ids)).all()
+    position = {book_id: i for i, book_id in enumerate(book_ids)}
+    return sorted(results, key=lambda result: position[result[0].id])
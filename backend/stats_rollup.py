@@ -0,0 +1,159 @@
+from sqlalchemy import func, extract
+
+from backend.extensions import db
+from backend.conditional import bump_data_version
+from backend.models import Book, ReadingStatus, MonthlyReadingStats
+
+# Bucket for books marked 'read' that have no finish_date
+UNDATED = (0, 0)
+
+
+def status_contribution(reading_status, page_count):
+    """Returns the (year, month) bucket and the counters one reading status adds to the rollup.
+
+    Returns None when the status does not count towards the stats (anything but 'read').
+    """
+    if reading_status is None or reading_status.status != 'read':
+        return None
+    finish_date = reading_status.finish_date
+    bucket = (finish_date.year, finish_date.month) if finish_date else UNDATED
+    has_rating = reading_status.rating is not None
+    return bucket, {
+        'books_read': 1,
+        'pages_read': page_count or 0,
+        'rating_sum': reading_status.rating if has_rating else 0,
+        'rating_count': 1 if has_rating else 0,
+    }
+
+
+def upsert_counters(user_id, bucket, deltas):
+    """Adds deltas to one rollup row with a single INSERT ... ON CONFLICT DO UPDATE.
+
+    The increment happens in the database, so concurrent writers for the same
+    user and month can neither lose an update nor race to create the row.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    table = MonthlyReadingStats.__table__
+    year, month = bucket
+    stmt = dialect_insert(table).values(user_id=user_id, year=year, month=month, **deltas)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['user_id', 'year', 'month'],
+        set_={field: table.c[field] + stmt.excluded[field] for field in deltas},
+    ))
+
+
+def apply_contribution(user_id, contribution, sign=1):
+    """Adds (sign=1) or removes (sign=-1) a contribution in the current session.
+
+    The change is committed together with the caller's ReadingStatus change.
+    Returns True if the rollup changed.
+    """
+    if contribution is None:
+        return False
+    bucket, counters = contribution
+    upsert_counters(user_id, bucket, {field: sign * value for field, value in counters.items()})
+    return True
+
+
+def replace_contribution(user_id, old, new):
+    """Moves a status from its old contribution to its new one, skipping no-op changes.
+
+    Old and new are netted per month, so a change within one month is a single statement.
+    Returns True if the rollup changed.
+    """
+    if old == new:
+        return False
+    deltas = {}
+    for contribution, sign in ((old, -1), (new, 1)):
+        if contribution is None:
+            continue
+        bucket, counters = contribution
+        bucket_deltas = deltas.setdefault(bucket, dict.fromkeys(counters, 0))
+        for field, value in counters.items():
+            bucket_deltas[field] += sign * value
+    for bucket, bucket_deltas in deltas.items():
+        if any(bucket_deltas.values()):
+            upsert_counters(user_id, bucket, bucket_deltas)
+    return True
+
+
+def compute_rollup(user_id=None):
+    """Aggregates ReadingStatus from scratch into {(user_id, year, month): counters}."""
+    year = func.coalesce(extract('year', ReadingStatus.finish_date), 0)
+    month = func.coalesce(extract('month', ReadingStatus.finish_date), 0)
+    query = db.session.query(
+        ReadingStatus.user_id,
+        year.label('year'),
+        month.label('month'),
+        func.count(ReadingStatus.id).label('books_read'),
+        func.coalesce(func.sum(Book.page_count), 0).label('pages_read'),
+        func.coalesce(func.sum(ReadingStatus.rating), 0).label('rating_sum'),
+        func.count(ReadingStatus.rating).label('rating_count'),
+    ).join(Book, ReadingStatus.book_id == Book.id).filter(
+        ReadingStatus.status == 'read'
+    )
+    if user_id is not None:
+        query = query.filter(ReadingStatus.user_id == user_id)
+    query = query.group_by(ReadingStatus.user_id, 'year', 'month')
+
+    return {
+        (r.user_id, int(r.year), int(r.month)): {
+            'books_read': r.books_read,
+            'pages_read': int(r.pages_read),
+            'rating_sum': int(r.rating_sum),
+            'rating_count': r.rating_count,
+        }
+        for r in query.all()
+    }
+
+
+def stored_rollup(user_id=None):
+    """Reads the current rollup table into the same shape as compute_rollup, dropping empty rows."""
+    query = MonthlyReadingStats.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    return {
+        (r.user_id, r.year, r.month): {
+            'books_read': r.books_read,
+            'pages_read': r.pages_read,
+            'rating_sum': r.rating_sum,
+            'rating_count': r.rating_count,
+        }
+        for r in query.all()
+        if r.books_read
+    }
+
+
+def diff_rollup(user_id=None):
+    """Returns the computed rollup and the (user_id, year, month) keys where the stored table disagrees."""
+    expected = compute_rollup(user_id)
+    stored = stored_rollup(user_id)
+    mismatched = sorted(key for key in set(expected) | set(stored) if expected.get(key) != stored.get(key))
+    return expected, mismatched
+
+
+def rebuild_rollup(user_id=None, commit=True):
+    """Replaces the rollup rows with freshly computed ones and returns the keys that differed.
+
+    Pass commit=False to leave the rewrite in the caller's transaction.
+    """
+    expected, mismatched = diff_rollup(user_id)
+
+    delete_query = MonthlyReadingStats.query
+    if user_id is not None:
+        delete_query = delete_query.filter_by(user_id=user_id)
+    delete_query.delete(synchronize_session=False)
+
+    db.session.add_all(
+        MonthlyReadingStats(user_id=uid, year=year, month=month, **counters)
+        for (uid, year, month), counters in expected.items()
+    )
+    # Corrected users get a new data version, so their cached stats stop matching
+    for uid in {uid for uid, _, _ in mismatched}:
+        bump_data_version(uid)
+    if commit:
+        db.session.commit()
+    return mismatched
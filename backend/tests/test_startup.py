@@ -0,0 +1,28 @@
+"""Cold-start checks: heavy modules stay out of `import backend.app` and create_app().
+
+Each test starts a fresh interpreter through backend/benchmarks/bench_startup.py,
+which also serves / and /api/books/ once. Timings are compared by the benchmark
+itself (--baseline), not here.
+
+Run from the repository root:
+    python -m pytest backend/tests
+"""
+import pytest
+
+from backend.benchmarks.bench_startup import LAZY_AFTER_CREATE, LAZY_AFTER_IMPORT, eager_modules, run_once
+
+
+@pytest.fixture(scope='module')
+def cold_start():
+    timing, _ = run_once()
+    return timing
+
+
+def test_import_leaves_models_and_blueprints_unloaded(cold_start):
+    eager = [name for name in eager_modules(cold_start) if name in LAZY_AFTER_IMPORT]
+    assert eager == [], f'imported by `import backend.app`: {eager}'
+
+
+def test_create_app_leaves_background_modules_unloaded(cold_start):
+    eager = [name for name in eager_modules(cold_start) if name in LAZY_AFTER_CREATE]
+    assert eager == [], f'imported by create_app(): {eager}'
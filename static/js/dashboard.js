@@ -1,6 +1,27 @@
 document.addEventListener('DOMContentLoaded', () => {
     const defaultCoverImage = 'https://via.placeholder.com/150x225.png?text=No+Cover'; // A default placeholder
 
+    // Only the fields the dashboard renders; leaves out large ones like description and notes
+    const LIST_FIELDS = 'title,author,cover_image_url,reading_status.finish_date,reading_status.added_date';
+
+    // --- Helper to fetch a book list page by page using the API's keyset cursor ---
+    async function fetchAllBookPages(baseUrl, pageSize = 100) {
+        const separator = baseUrl.includes('?') ? '&' : '?';
+        let books = [];
+        let cursor = null;
+        do {
+            const url = `${baseUrl}${separator}limit=${pageSize}&fields=${LIST_FIELDS}` + (cursor !== null ? `&cursor=${cursor}` : '');
+            const response = await fetch(url);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const page = await response.json();
+            books = books.concat(page.books);
+            cursor = page.next_cursor;
+        } while (cursor !== null);
+        return books;
+    }
+
     // --- Helper function to create book elements for "Currently Reading" ---
     function createCurrentlyReadingBookElement(book) {
         const bookElement = document.createElement('div');
@@ -55,11 +76,7 @@ document.addEventListener('DOMContentLoaded', () => {
         container.innerHTML = ''; // Clear existing content
 
         try {
-            const response = await fetch('/api/books?status=currently_reading');
-            if (!response.ok) {
-                throw new Error(`HTTP error! status: ${response.status}`);
-            }
-            const books = await response.json();
+            const books = await fetchAllBookPages('/api/books?status=currently_reading');
             if (books.length === 0) {
                 container.innerHTML = '<p class="text-white/50">No books currently being read.</p>';
             } else {
@@ -83,23 +100,12 @@ document.addEventListener('DOMContentLoaded', () => {
         container.innerHTML = ''; // Clear existing content
 
         try {
-            // Assuming backend sorts by finish_date or added_date for "read" status
-            const response = await fetch('/api/books?status=read'); 
+            // The server returns the 4 most recently finished books (4 for a 4-column grid)
+            const response = await fetch(`/api/books?status=read&order=-finish_date&limit=4&fields=${LIST_FIELDS}`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
-            let books = await response.json();
-            
-            // Sort by finish_date descending, then added_date descending if finish_date is null or equal
-            // Books with no finish_date will be at the end.
-            books.sort((a, b) => {
-                const dateA = a.reading_status?.finish_date ? new Date(a.reading_status.finish_date) : new Date(a.reading_status?.added_date || 0);
-                const dateB = b.reading_status?.finish_date ? new Date(b.reading_status.finish_date) : new Date(b.reading_status?.added_date || 0);
-                return dateB - dateA;
-            });
-
-            // Limit to the latest 4-5 (let's say 4 for a 4-column grid, or more if design adapts)
-            const limitedBooks = books.slice(0, 4); 
+            const limitedBooks = (await response.json()).books;
 
             if (limitedBooks.length === 0) {
                 container.innerHTML = '<p class="text-white/50">No books recently read.</p>';
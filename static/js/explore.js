@@ -2,7 +2,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const defaultCoverImage = 'https://via.placeholder.com/150x225.png?text=No+Cover';
     const featuredBooksContainer = document.getElementById('featured-books-container');
     const searchInput = document.getElementById('search-explore-input');
-    let allFeaturedBooks = []; // To store initially fetched books for client-side search
+    let allFeaturedBooks = []; // Shown again when the search box is cleared
 
     // --- Helper function to create book elements for "Featured Books" ---
     function createFeaturedBookElement(book) {
@@ -47,11 +47,24 @@ document.addEventListener('DOMContentLoaded', () => {
             return;
         }
         try {
-            const response = await fetch('/api/books'); // Fetches all books
+            // Prefer books the user doesn't have yet; the index may not be built (503) or may be empty
+            const recommendationsResponse = await fetch('/api/recommendations?limit=6');
+            if (recommendationsResponse.ok) {
+                const recommended = await recommendationsResponse.json();
+                if (recommended.length > 0) {
+                    allFeaturedBooks = recommended;
+                    renderBooks(allFeaturedBooks);
+                    return;
+                }
+            }
+
+            // Only the first page is needed for "Featured", so don't download the whole library
+            const response = await fetch('/api/books?limit=6&fields=title,author,cover_image_url');
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
-            const books = await response.json();
+            const page = await response.json();
+            const books = page.books;
             // For "Featured", let's take the first 6-10. Let's aim for 6.
             // The API returns books with reading_status. We need to ensure we handle that.
             // The /api/books endpoint returns book data *with* reading status for the default user.
@@ -74,24 +87,44 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- Search Functionality ---
+    // Searches all books on the server (full-text, ranked) instead of filtering the featured list.
+    let searchTimer = null;
+    let latestSearchTerm = '';
+
+    async function searchBooks(searchTerm) {
+        try {
+            const response = await fetch(`/api/books/search?q=${encodeURIComponent(searchTerm)}&limit=20`);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const page = await response.json();
+            // Ignore responses for a term the user has already typed past
+            if (searchTerm === latestSearchTerm) {
+                renderBooks(page.books);
+            }
+        } catch (error) {
+            console.error('Error searching books:', error);
+            if (featuredBooksContainer) {
+                featuredBooksContainer.innerHTML = '<p class="text-red-500 col-span-full text-center">Error searching books.</p>';
+            }
+        }
+    }
+
     function setupSearch() {
         if (!searchInput) {
             console.error('Search input not found.');
             return;
         }
         searchInput.addEventListener('input', (event) => {
-            const searchTerm = event.target.value.toLowerCase().trim();
+            const searchTerm = event.target.value.trim();
+            latestSearchTerm = searchTerm;
+            clearTimeout(searchTimer);
             if (!searchTerm) {
                 renderBooks(allFeaturedBooks); // Show all featured if search is empty
                 return;
             }
-
-            const filteredBooks = allFeaturedBooks.filter(book => {
-                const titleMatch = book.title.toLowerCase().includes(searchTerm);
-                const authorMatch = book.author ? book.author.toLowerCase().includes(searchTerm) : false;
-                return titleMatch || authorMatch;
-            });
-            renderBooks(filteredBooks);
+            // Debounce so we send one request per pause in typing, not one per keystroke
+            searchTimer = setTimeout(() => searchBooks(searchTerm), 250);
         });
     }
 
@@ -60,60 +60,40 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
 
-    // --- Fetch and Display Summary Statistics ---
-    async function fetchSummaryStatistics() {
-        try {
-            const response = await fetch('/api/stats/summary');
-            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-            const summary = await response.json();
-
-            if (statsBooksReadEl) statsBooksReadEl.textContent = summary.total_books_read || '0';
-            if (statsTotalPagesReadEl) statsTotalPagesReadEl.textContent = summary.total_pages_read || '0';
-            if (statsAverageRatingEl) statsAverageRatingEl.textContent = summary.average_rating?.toFixed(1) || 'N/A';
+    // --- Render Summary Statistics ---
+    function renderSummaryStatistics(summary) {
+        if (statsBooksReadEl) statsBooksReadEl.textContent = summary.total_books_read || '0';
+        if (statsTotalPagesReadEl) statsTotalPagesReadEl.textContent = summary.total_pages_read || '0';
+        if (statsAverageRatingEl) statsAverageRatingEl.textContent = summary.average_rating?.toFixed(1) || 'N/A';
+    }
 
-        } catch (error) {
-            console.error('Error fetching summary statistics:', error);
-            if (statsBooksReadEl) statsBooksReadEl.textContent = 'Error';
-            if (statsTotalPagesReadEl) statsTotalPagesReadEl.textContent = 'Error';
-            if (statsAverageRatingEl) statsAverageRatingEl.textContent = 'Error';
-        }
+    // --- Render a monthly series ({ month_year: "Jan 2023", <valueKey>: X }) as a bar chart ---
+    function renderMonthlyChart(container, monthlyData, valueKey) {
+        // Transform month_year to just month for label e.g. "Jan"
+        const chartData = monthlyData.map(d => ({
+            label: d.month_year.split(' ')[0], // Get 'Jan' from 'Jan 2023'
+            value: d[valueKey]
+        }));
+        renderBarChart(container, chartData, 'value', 'label');
     }
 
-    // --- Fetch and Render "Books Read Per Month" Chart ---
-    async function fetchBooksPerMonth() {
+    // --- Fetch summary and both charts in a single request ---
+    async function fetchStatsOverview() {
         try {
-            const response = await fetch('/api/stats/books_per_month');
+            const response = await fetch('/api/stats/overview?months=12');
             if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-            const booksData = await response.json(); // Expects { month_year: "Jan 2023", count: X }
+            const overview = await response.json();
 
-            // Transform month_year to just month for label e.g. "Jan"
-            const chartData = booksData.map(d => ({
-                label: d.month_year.split(' ')[0], // Get 'Jan' from 'Jan 2023'
-                value: d.count
-            }));
-            renderBarChart(booksPerMonthChartContainer, chartData, 'value', 'label');
+            renderSummaryStatistics(overview.summary);
+            renderMonthlyChart(booksPerMonthChartContainer, overview.books_per_month, 'count');
+            renderMonthlyChart(pagesPerMonthChartContainer, overview.pages_read_per_month, 'total_pages');
 
         } catch (error) {
-            console.error('Error fetching books per month:', error);
+            console.error('Error fetching statistics overview:', error);
+            if (statsBooksReadEl) statsBooksReadEl.textContent = 'Error';
+            if (statsTotalPagesReadEl) statsTotalPagesReadEl.textContent = 'Error';
+            if (statsAverageRatingEl) statsAverageRatingEl.textContent = 'Error';
             if (booksPerMonthChartContainer) booksPerMonthChartContainer.innerHTML = '<p class="text-red-500 col-span-full text-center">Error loading chart.</p>';
-        }
-    }
-
-    // --- Fetch and Render "Pages Read Per Month" Chart ---
-    async function fetchPagesPerMonth() {
-         try {
-            const response = await fetch('/api/stats/pages_read_per_month');
-            if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
-            const pagesData = await response.json(); // Expects { month_year: "Jan 2023", total_pages: Y }
-
-            const chartData = pagesData.map(d => ({
-                label: d.month_year.split(' ')[0],
-                value: d.total_pages
-            }));
-            renderBarChart(pagesPerMonthChartContainer, chartData, 'value', 'label');
-
-        } catch (error) {
-            console.error('Error fetching pages per month:', error);
             if (pagesPerMonthChartContainer) pagesPerMonthChartContainer.innerHTML = '<p class="text-red-500 col-span-full text-center">Error loading chart.</p>';
         }
     }
@@ -137,8 +117,6 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // --- Initial Load ---
-    fetchSummaryStatistics();
-    fetchBooksPerMonth();
-    fetchPagesPerMonth();
+    fetchStatsOverview();
     setupNavigation();
 });